@@ -1,28 +1,49 @@
+import os
 import sys
-import subprocess
+import json
+import shutil
 import logging
+import tempfile
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QGridLayout, QPushButton, QLabel, QTextEdit, QProgressBar,
     QFileDialog, QComboBox, QSpinBox, QScrollArea, QMessageBox, QDialog, QDialogButtonBox,
-    QVBoxLayout, QFrame, QHBoxLayout, QMenu, QAction, QToolBar, QStatusBar, QShortcut
+    QVBoxLayout, QFrame, QHBoxLayout, QMenu, QAction, QToolBar, QStatusBar, QShortcut,
+    QProgressDialog
 )
-from PyQt5.QtCore import Qt, QTimer, QMutex, pyqtSignal, QThread
+from PyQt5.QtCore import Qt, QTimer, QMutex, pyqtSignal, QThread, QThreadPool
 from PyQt5.QtGui import QFont, QIcon, QKeySequence
 from PyQt5.Qsci import QsciScintilla, QsciLexerPython, QsciLexerJavaScript, QsciLexerCSharp
 from PyQt5.QtWidgets import QStyle
 
 from modules.worker_signals import WorkerSignals
-from modules.generate_question_task import GenerateQuestionTask
+from modules.question_scheduler import QuestionScheduler
+from modules.question_prefetcher import QuestionPrefetcher
 from modules.feedback_thread import FeedbackThread
+from modules.feedback_sink import FeedbackSink
 from modules.config_manager import ConfigManager
 from modules.theme_manager import ThemeManager
 from modules.file_manager import FileManager
+from modules.document_index import DocumentIndex
+from modules.question_dedup import QuestionDeduplicator
 from modules.settings_dialog import SettingsDialog
 from modules.statistics_dialog import StatisticsDialog
 from modules.help_dialog import HelpDialog
 from modules.feedback_dialog import FeedbackDialog
 from modules.model_settings_dialog import ModelSettingsDialog
+from modules.code_runner import CodeRunner, WarmCodeRunner
+from modules.compile_cache import COMPILE_SETTINGS, build_command, compile_cache
+from modules.code_judge import JudgeTask, JUDGE_LANGUAGES
+from modules.warm_workers import warm_workers
+from modules.document_loader import extraction_pool
+from modules.batch_grader import BatchGrader
+from modules.batch_results_dialog import BatchResultsDialog
+from modules.local_grader import answer_keys, grade_answer, format_result
+from modules.llm_caller import llm_caller
+from modules.telemetry import telemetry
+
+# 解析追加在本地评分结果之后，以此标记区分
+EXPLANATION_HEADER = "\n\n解析：\n"
 
 # 日志配置
 logging.basicConfig(
@@ -37,6 +58,12 @@ class CodeEditorDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("编程环境")
         self.setGeometry(200, 150, 900, 600)
+        self.runner = self.connect_runner(CodeRunner(parent=self))
+        # 有常驻工作进程的语言由对应的 WarmCodeRunner 运行，active_runner 为当前使用的运行器
+        self.warm_runners = {}
+        self.active_runner = self.runner
+        self.workspace = None
+        self.pending_binary = None
         self.init_ui()
 
     def init_ui(self):
@@ -78,10 +105,16 @@ class CodeEditorDialog(QDialog):
         self.output_display.setReadOnly(True)
         layout.addWidget(self.output_display)
 
-        # 编译和运行按钮
+        # 编译、运行和停止按钮
+        button_layout = QHBoxLayout()
         self.run_button = QPushButton("运行代码", self)
         self.run_button.clicked.connect(self.run_code)
-        layout.addWidget(self.run_button)
+        self.stop_button = QPushButton("停止", self)
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_code)
+        button_layout.addWidget(self.run_button)
+        button_layout.addWidget(self.stop_button)
+        layout.addLayout(button_layout)
 
         # 初始化为Python语言
         self.change_language()
@@ -107,44 +140,115 @@ class CodeEditorDialog(QDialog):
 
         self.code_editor.setLexer(lexer)
 
+    def connect_runner(self, runner):
+        """把运行器的输出和结束信号接到输出区域"""
+        runner.output.connect(self.append_output)
+        runner.compiled.connect(self.on_compiled)
+        runner.finished.connect(self.on_run_finished)
+        return runner
+
+    def warm_runner(self, language):
+        """返回使用常驻工作进程的运行器，该语言没有可用的工作进程时返回 None"""
+        if language not in self.warm_runners:
+            pool = warm_workers.get_pool(language)
+            self.warm_runners[language] = (
+                self.connect_runner(WarmCodeRunner(pool, self.runner.wall_timeout, parent=self))
+                if pool is not None else None
+            )
+        return self.warm_runners[language]
+
     def run_code(self):
-        """根据选择的语言运行代码"""
+        """根据选择的语言运行代码
+
+        Python 和 JavaScript 优先交给常驻工作进程；其他情况每次运行使用独立的临时工作目录。
+        """
+        if self.active_runner.is_running():
+            return
         code = self.code_editor.text()
         language = self.language_combo.currentText()
+        warm_runner = self.warm_runner(language) if language in ("Python", "JavaScript") else None
+        if warm_runner is not None:
+            self.active_runner = warm_runner
+            self.execute_command(code)
+            return
+        self.active_runner = self.runner
+        self.workspace = tempfile.mkdtemp(prefix="exam_run_")
+        self.runner.working_dir = self.workspace
+        self.pending_binary = None
 
         # 根据语言选择编译器或解释器
         if language == "Python":
             self.execute_command(["python", "-c", code])
         elif language == "JavaScript":
             self.execute_command(["node", "-e", code])
-        elif language == "C#":
-            temp_file = self.save_code_to_tempfile("Program.cs", code)
-            self.execute_command(["csc", temp_file, "/out:Program.exe"], post_command=["Program.exe"])
-        elif language == "C++":
-            temp_file = self.save_code_to_tempfile("program.cpp", code)
-            self.execute_command(["g++", temp_file, "-o", "program"], post_command=["./program"])
+        elif language in COMPILE_SETTINGS:
+            settings = COMPILE_SETTINGS[language]
+            key = compile_cache.make_key(code, settings["compiler"], settings["flags"])
+            cached_binary = compile_cache.get(key, settings["binary"])
+            if cached_binary is not None:
+                # 源代码和编译器都未变化，直接运行缓存中的程序
+                self.execute_command([cached_binary])
+                self.append_output("[使用已缓存的编译结果]\n")
+                return
+            source_file = self.save_code_to_tempfile(settings["source"], code)
+            binary_file = os.path.join(self.workspace, settings["binary"])
+            self.pending_binary = (key, binary_file)
+            self.execute_command(build_command(language, source_file, binary_file), post_command=[binary_file])
 
     def save_code_to_tempfile(self, filename, code):
-        """将代码保存到临时文件"""
-        with open(filename, "w") as file:
+        """将代码保存到本次运行的临时工作目录"""
+        path = os.path.join(self.workspace, filename)
+        with open(path, "w", encoding="utf-8") as file:
             file.write(code)
-        return filename
+        return path
+
+    def stop_code(self):
+        """停止当前运行"""
+        self.active_runner.stop()
+
+    def on_compiled(self):
+        """编译成功后把可执行文件存入编译缓存"""
+        if self.pending_binary is not None:
+            compile_cache.put(*self.pending_binary)
+            self.pending_binary = None
 
     def execute_command(self, command, post_command=None):
-        """执行命令并显示结果"""
-        try:
-            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=True)
-            output = result.stdout + result.stderr
-            self.output_display.setPlainText(output)
+        """异步执行命令，输出逐段显示；有后续命令时 command 为编译命令
 
-            # 如果有后续命令（如编译后运行）
+        使用常驻工作进程时 command 为源代码。
+        """
+        try:
+            self.output_display.clear()
             if post_command:
-                post_result = subprocess.run(post_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, shell=True)
-                post_output = post_result.stdout + post_result.stderr
-                self.output_display.append(post_output)
+                self.active_runner.run(post_command, compile_command=command)
+            else:
+                self.active_runner.run(command)
+            self.run_button.setEnabled(False)
+            self.stop_button.setEnabled(True)
         except Exception as e:
             self.output_display.setPlainText(f"运行时出错: {str(e)}")
 
+    def append_output(self, text):
+        """把新输出追加到输出区域末尾"""
+        cursor = self.output_display.textCursor()
+        cursor.movePosition(cursor.End)
+        cursor.insertText(text)
+        self.output_display.setTextCursor(cursor)
+
+    def on_run_finished(self, exit_code, elapsed, status):
+        """显示退出码和耗时，并恢复按钮状态"""
+        self.append_output(f"\n[{status}] 退出码: {exit_code}，耗时: {elapsed:.2f} 秒\n")
+        self.run_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        if self.workspace is not None:
+            shutil.rmtree(self.workspace, ignore_errors=True)
+            self.workspace = None
+
+    def closeEvent(self, event):
+        """关闭编程窗口时终止仍在运行的程序"""
+        self.stop_code()
+        event.accept()
+
 
 class ExamApp(QWidget):
     """考试应用主界面"""
@@ -154,15 +258,34 @@ class ExamApp(QWidget):
         self.config = ConfigManager()
         self.theme_manager = ThemeManager(self.config)
         self.file_manager = FileManager()
+        self.document_index = DocumentIndex()
+        self.question_dedup = QuestionDeduplicator()
+        self.question_scheduler = QuestionScheduler(
+            self.config, self.document_index, self.question_dedup, self
+        )
+        self.question_prefetcher = QuestionPrefetcher(
+            self.config, self.document_index, self.question_dedup, self
+        )
+        self.batch_grader = BatchGrader(self.config, self)
+        self.batch_results_dialog = None
         self.init_ui()
 
+        self.question_scheduler.signals.result.connect(self.add_question)
+        self.question_scheduler.signals.progress.connect(self.progress_bar.setValue)
+        self.question_scheduler.signals.complete.connect(self.on_question_generation_complete)
+        self.question_scheduler.signals.error.connect(self.handle_task_error)
+        self.batch_grader.graded.connect(self.on_batch_graded)
+        self.batch_grader.finished.connect(self.on_batch_finished)
+
         self.mutex = QMutex()
         self.questions = []
         self.answers = {}
+        self.answer_languages = {}
         self.feedback = {}
         self.timestamps = {}
         self.current_question_index = 0
-        self.file_question_history = []
+        # 每开始新一轮出题加一，上一轮仍在进行的评分结果不写入新一轮的同一题号
+        self.question_round = 0
         self.running_threads = []
         self.total_attempts = 0
         self.correct_answers = 0
@@ -294,6 +417,29 @@ class ExamApp(QWidget):
         self.submit_button.clicked.connect(self.submit_answer)
         self.submit_button.setToolTip("提交您的答案并获取反馈")
 
+        self.submit_all_button = QPushButton("全部提交", self)
+        self.submit_all_button.setEnabled(False)
+        self.submit_all_button.clicked.connect(self.submit_all_answers)
+        self.submit_all_button.setToolTip("同时提交所有已作答但尚未评分的题目")
+
+        self.explain_button = QPushButton("获取解析", self)
+        self.explain_button.setEnabled(False)
+        self.explain_button.clicked.connect(self.request_explanation)
+        self.explain_button.setToolTip("请求模型讲解已在本地评分的客观题")
+
+        # 编程题答案所用的语言，决定本地评测如何运行代码
+        self.code_language_combo = QComboBox(self)
+        self.code_language_combo.addItems(["Python", "JavaScript", "C#", "C++"])
+        self.code_language_combo.setToolTip("编程题答案使用的语言，只有 Python 和 JavaScript 会在本地运行测试用例")
+        self.code_language_combo.currentIndexChanged.connect(self.change_code_language)
+        self.code_language_combo.hide()
+
+        submit_layout = QHBoxLayout()
+        submit_layout.addWidget(self.code_language_combo)
+        submit_layout.addWidget(self.submit_button)
+        submit_layout.addWidget(self.submit_all_button)
+        submit_layout.addWidget(self.explain_button)
+
         navigation_layout = QHBoxLayout()
         self.prev_button = QPushButton("上一题", self)
         self.prev_button.setEnabled(False)
@@ -314,7 +460,7 @@ class ExamApp(QWidget):
 
         self.left_layout.addWidget(question_scroll_area)
         self.left_layout.addWidget(self.answer_edit)
-        self.left_layout.addWidget(self.submit_button)
+        self.left_layout.addLayout(submit_layout)
         self.left_layout.addLayout(navigation_layout)
 
         right_frame = QFrame(self)
@@ -367,6 +513,10 @@ class ExamApp(QWidget):
         model_settings_action.triggered.connect(self.open_model_settings_dialog)
         self.toolbar.addAction(model_settings_action)
 
+        export_action = QAction(QIcon.fromTheme("document-save-as"), "导出数据", self)
+        export_action.triggered.connect(self.export_data)
+        self.toolbar.addAction(export_action)
+
         self.layout().addWidget(self.toolbar)
 
     def setup_shortcuts(self):
@@ -390,16 +540,19 @@ class ExamApp(QWidget):
         """处理语言选择的更改"""
         self.config.language = self.language_combo.currentText()
         logging.info(f"用户选择了{self.config.language}语言")
+        self.question_prefetcher.refresh()
 
     def change_difficulty(self):
         """处理难度选择的更改"""
         self.config.difficulty = self.difficulty_combo.currentText()
         logging.info(f"用户选择了{self.config.difficulty}难度")
+        self.question_prefetcher.refresh()
 
     def change_question_type(self):
         """处理题型选择的更改"""
         self.config.question_type = self.question_type_combo.currentText()
         logging.info(f"用户选择了{self.config.question_type}题型")
+        self.question_prefetcher.refresh()
 
     def apply_theme(self):
         """根据选择的主题应用不同的样式"""
@@ -407,28 +560,24 @@ class ExamApp(QWidget):
         self.setStyleSheet(style_sheet)
 
     def auto_backup(self):
-        """自动备份数据"""
+        """在后台线程中自动备份数据（无变化时跳过）"""
         try:
-            self.file_manager.backup_data()
-            self.status_bar.showMessage("自动备份成功", 5000)
-            logging.info("自动备份成功")
+            task = self.file_manager.backup_data()
+            task.signals.result.connect(lambda message: self.status_bar.showMessage(message, 5000))
+            task.signals.error.connect(lambda message: self.status_bar.showMessage("自动备份失败", 5000))
+            QThreadPool.globalInstance().start(task)
         except Exception as e:
             logging.error(f"自动备份失败: {e}")
             self.status_bar.showMessage("自动备份失败", 5000)
 
     def save_buffer_to_file(self):
-        """批量保存队列中的数据到文件"""
-        self.mutex.lock()
+        """将保存队列中的数据交给后台线程写入，并写出新的模型调用指标"""
         try:
-            if not self.file_manager.save_buffer:
-                return
             self.file_manager.save_to_file()
-            self.file_manager.save_buffer.clear()
+            telemetry.flush()
         except Exception as e:
             logging.error(f"保存数据时出错: {e}")
             self.status_bar.showMessage("保存数据时出错", 5000)
-        finally:
-            self.mutex.unlock()
 
     def show_instructions(self):
         """显示使用说明"""
@@ -436,7 +585,7 @@ class ExamApp(QWidget):
         dialog.exec_()
 
     def upload_files(self):
-        """上传文件功能"""
+        """上传文件功能，文件在后台并行解析"""
         try:
             file_names, _ = QFileDialog.getOpenFileNames(
                 self,
@@ -444,17 +593,39 @@ class ExamApp(QWidget):
                 "",
                 "All Files (*)",
             )
-            if file_names:
-                file_content = self.file_manager.read_files(file_names)
-                self.config.file_content = file_content
-                self.generate_button.setEnabled(True)
-                self.file_question_history = []
-                QMessageBox.information(self, "上传成功", "文件上传成功！")
-                logging.info(f"文件上传成功: {file_names}")
+            if not file_names:
+                return
+
+            task = self.file_manager.read_files_task(file_names, self.document_index)
+            progress_dialog = QProgressDialog("正在读取资料...", "取消", 0, 100, self)
+            progress_dialog.setWindowTitle("上传资料")
+            progress_dialog.setAutoClose(False)
+            progress_dialog.canceled.connect(task.cancel)
+            task.signals.progress.connect(progress_dialog.setValue)
+            task.signals.result.connect(
+                lambda file_content: self.on_files_loaded(file_names, file_content)
+            )
+            task.signals.error.connect(
+                lambda message: QMessageBox.warning(self, "上传失败", "文件上传失败，请检查文件格式和内容。")
+            )
+            task.signals.complete.connect(progress_dialog.close)
+            self.upload_button.setEnabled(False)
+            task.signals.complete.connect(lambda: self.upload_button.setEnabled(True))
+            progress_dialog.show()
+            QThreadPool.globalInstance().start(task)
         except Exception as e:
             logging.error(f"文件上传失败: {e}")
             QMessageBox.warning(self, "上传失败", "文件上传失败，请检查文件格式和内容。")
 
+    def on_files_loaded(self, file_names, file_content):
+        """资料解析完成（索引已在后台建立）"""
+        self.config.file_content = file_content
+        self.generate_button.setEnabled(True)
+        self.question_prefetcher.invalidate()
+        self.question_dedup.reset()
+        QMessageBox.information(self, "上传成功", "文件上传成功！")
+        logging.info(f"文件上传成功: {file_names}")
+
     def open_text_input_dialog(self):
         """打开文本输入对话框"""
         dialog = QDialog(self)
@@ -476,71 +647,78 @@ class ExamApp(QWidget):
         """设置输入的内容为资料内容"""
         if text.strip():
             self.config.file_content = text.strip()
+            self.document_index.build(self.config.file_content)
             self.generate_button.setEnabled(True)
-            self.file_question_history = []
+            self.question_prefetcher.invalidate()
+            self.question_dedup.reset()
             logging.info("资料内容输入成功。")
             dialog.close()
             QMessageBox.information(self, "输入成功", "资料内容输入成功！")
 
     def start_question_generation(self):
         """开始生成题目"""
-        if not self.config.file_content:
+        if not self.config.file_content and self.document_index.is_empty():
             self.question_label.setText("请先上传资料文件或输入资料内容！")
             return
 
+        # 新一轮题目的题号从 0 开始，上一轮按题号保存的答案和反馈不再适用
+        self.batch_grader.cancel()
+        self.question_round += 1
         self.questions = []
+        self.answers = {}
+        self.answer_languages = {}
+        self.feedback = {}
         num_questions = self.spin_box.value()
-        self.progress_bar.setMaximum(num_questions)
-        self.progress_bar.setValue(0)
         self.current_question_index = 0
 
-        logging.info(f"开始生成 {num_questions} 道题目。")
+        # 先使用后台预取好的题目，只为不足的部分发起请求
+        prefetched = self.question_prefetcher.take(num_questions)
+        for question in prefetched:
+            self.add_question(question)
+        remaining = num_questions - len(prefetched)
+        if remaining == 0:
+            logging.info(f"{num_questions} 道题目全部来自预取缓冲区。")
+            self.progress_bar.setMaximum(num_questions)
+            self.progress_bar.setValue(num_questions)
+            self.on_question_generation_complete()
+            return
+
+        self.progress_bar.setMaximum(remaining)
+        self.progress_bar.setValue(0)
+        logging.info(f"开始生成 {remaining} 道题目（{len(prefetched)} 道来自预取缓冲区）。")
         self.generate_button.setEnabled(False)  # 禁用按钮，防止重复点击
 
-        for _ in range(num_questions):
-            try:
-                task = GenerateQuestionTask(
-                    self.config,
-                    self.file_question_history,
-                    self.add_question,
-                )
-                task.signals.result.connect(self.add_question)
-                task.signals.complete.connect(self.on_question_generation_complete)
-                task.signals.error.connect(self.handle_task_error)
-                task.start()
-                self.running_threads.append(task)
-            except Exception as e:
-                logging.error(f"启动生成题目任务时出错: {e}")
-                QMessageBox.warning(self, "错误", "启动生成题目任务时出错，请重试。")
-                self.generate_button.setEnabled(True)
+        try:
+            self.question_scheduler.start(remaining)
+        except Exception as e:
+            logging.error(f"启动生成题目任务时出错: {e}")
+            QMessageBox.warning(self, "错误", "启动生成题目任务时出错，请重试。")
+            self.generate_button.setEnabled(True)
 
     def add_question(self, question):
         """添加生成的问题"""
         self.mutex.lock()
         try:
             self.questions.append(question)
-            self.file_question_history.append(question)
             self.timestamps[len(self.questions) - 1] = {
                 "question_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
-            self.progress_bar.setValue(len(self.questions))
         finally:
             self.mutex.unlock()
 
     def on_question_generation_complete(self):
-        """题目生成完成后，自动进入答题模式"""
-        if len(self.questions) == self.progress_bar.maximum():
-            self.current_question_index = 0
-            self.display_next_question()
-            self.submit_button.setEnabled(True)
-            self.prev_button.setEnabled(True)
-            self.next_button.setEnabled(True)
-            self.generate_button.setEnabled(True)  # 重新启用按钮
-
-        # 从运行线程列表中移除完成的线程
-        sender = self.sender()
-        if sender in self.running_threads:
-            self.running_threads.remove(sender)
+        """题目生成队列完成后，自动进入答题模式，并开始在后台预取后续题目"""
+        self.generate_button.setEnabled(True)  # 重新启用按钮
+        self.question_prefetcher.fill()
+        if not self.questions:
+            return
+        self.current_question_index = 0
+        self.display_next_question()
+        self.submit_button.setEnabled(True)
+        self.submit_all_button.setEnabled(True)
+        self.explain_button.setEnabled(True)
+        self.prev_button.setEnabled(True)
+        self.next_button.setEnabled(True)
 
     def handle_task_error(self, error_message):
         """处理任务中的错误"""
@@ -548,62 +726,263 @@ class ExamApp(QWidget):
         QMessageBox.warning(self, "错误", f"任务执行时出错：{error_message}")
         self.generate_button.setEnabled(True)
 
+    def current_answer_text(self):
+        """当前编辑器中的答案"""
+        current_answer = self.current_editor.text() if self.config.question_type == "编程题" else self.current_editor.toPlainText()
+        return current_answer.strip()
+
+    def store_current_answer(self):
+        """切换题目前保存当前题目已输入的答案，供全部提交时使用"""
+        current_answer = self.current_answer_text()
+        if self.questions and current_answer:
+            self.answers[self.current_question_index] = current_answer
+            if self.config.question_type == "编程题":
+                self.answer_languages[self.current_question_index] = self.code_language_combo.currentText()
+
+    def submit_all_answers(self):
+        """并发评分所有已作答且尚未评分的题目"""
+        if self.batch_grader.is_running():
+            return
+        self.store_current_answer()
+        items = [
+            (question_index, self.questions[question_index], answer)
+            for question_index, answer in sorted(self.answers.items())
+            if question_index not in self.feedback and question_index < len(self.questions)
+        ]
+        if not items:
+            QMessageBox.information(self, "提示", "没有需要评分的答案。")
+            return
+
+        answer_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for question_index, _, _ in items:
+            self.timestamps.setdefault(question_index, {}).setdefault("answer_time", answer_time)
+
+        # 有标准答案的客观题直接在本地评分，其余题目交给模型
+        local_results = {}
+        for question_index, question, answer in items:
+            feedback_text = self.grade_locally(question_index, question, answer)
+            if feedback_text is not None:
+                local_results[question_index] = feedback_text
+        remote_items = [item for item in items if item[0] not in local_results]
+
+        if self.batch_results_dialog is not None:
+            # 上一轮的结果表不再接收新一轮的评分结果
+            old_dialog = self.batch_results_dialog
+            self.batch_grader.progress.disconnect(old_dialog.set_progress)
+            self.batch_grader.graded.disconnect(old_dialog.set_graded)
+            self.batch_grader.failed.disconnect(old_dialog.set_failed)
+            self.batch_grader.finished.disconnect(old_dialog.set_finished)
+        self.batch_results_dialog = BatchResultsDialog(items, self)
+        self.batch_results_dialog.question_selected.connect(self.go_to_question)
+        self.batch_grader.progress.connect(self.batch_results_dialog.set_progress)
+        self.batch_grader.graded.connect(self.batch_results_dialog.set_graded)
+        self.batch_grader.failed.connect(self.batch_results_dialog.set_failed)
+        self.batch_grader.finished.connect(self.batch_results_dialog.set_finished)
+        for question_index, feedback_text in local_results.items():
+            self.batch_results_dialog.set_local_graded(question_index, feedback_text)
+        self.batch_results_dialog.show()
+        if self.current_question_index in local_results:
+            self.feedback_label.setText(local_results[self.current_question_index])
+
+        if not remote_items:
+            self.batch_results_dialog.set_finished()
+            return
+
+        self.submit_all_button.setEnabled(False)
+        self.question_prefetcher.set_paused(True)
+        self.batch_grader.start(remote_items, self.answer_languages)
+
+    def on_batch_graded(self, question_index, feedback_text, elapsed):
+        """批量评分中一道题完成，按题号记录反馈"""
+        if feedback_text:
+            self.record_feedback(question_index, self.questions[question_index], feedback_text)
+            if question_index == self.current_question_index:
+                self.feedback_label.setText(feedback_text)
+
+    def on_batch_finished(self):
+        self.submit_all_button.setEnabled(True)
+        if not self.running_threads:
+            self.question_prefetcher.set_paused(False)
+
     def submit_answer(self):
         """提交当前题目的答案并请求反馈"""
-        current_answer = self.current_editor.text() if self.config.question_type == "编程题" else self.current_editor.toPlainText()
-        current_answer = current_answer.strip()
+        current_answer = self.current_answer_text()
         if not current_answer:
             QMessageBox.warning(self, "提示", "请先输入答案！")
             return
 
-        question = self.questions[self.current_question_index]
-        self.feedback_label.setText("等待反馈中...")
+        question_index = self.current_question_index
+        question = self.questions[question_index]
+        question_round = self.question_round
         self.feedback_label.setVisible(True)
+        self.answers[question_index] = current_answer
+        self.timestamps[question_index][
+            "answer_time"
+        ] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # 有标准答案的客观题在本地即时评分，不请求模型
+        feedback_text = self.grade_locally(question_index, question, current_answer)
+        if feedback_text is not None:
+            self.feedback_label.setText(feedback_text)
+            return
+
+        # 评分进行中暂停预取，让评分请求优先
+        self.question_prefetcher.set_paused(True)
+
+        if self.config.question_type != "编程题":
+            self.feedback_label.setText("等待反馈中...")
+            self.start_feedback(question_index, question, current_answer)
+            return
+
+        # 编程题先在本地运行测试用例，再把评测结果交给模型评分；
+        # 无法在本地运行的语言或评测失败时直接请求模型评分
+        language = self.code_language_combo.currentText()
+        self.answer_languages[question_index] = language
+        if language not in JUDGE_LANGUAGES:
+            logging.info(f"本地评测不支持 {language}，直接请求模型评分")
+            self.start_feedback(question_index, question, current_answer)
+            return
+        self.feedback_label.setText("正在本地运行测试用例...")
+        task = JudgeTask(self.config, question, current_answer, language)
+        task.signals.result.connect(
+            lambda report: self.start_feedback(
+                question_index, question, current_answer, report, question_round=question_round
+            )
+        )
+        task.signals.error.connect(
+            lambda message: self.start_feedback(
+                question_index, question, current_answer, question_round=question_round
+            )
+        )
+        QThreadPool.globalInstance().start(task)
+
+    def grade_locally(self, question_index, question, answer):
+        """用标准答案在本地为客观题评分并记录反馈；没有标准答案或回答无法在本地解析时返回 None，由模型评分"""
+        entry = answer_keys.get(question)
+        if entry is None:
+            return None
+        question_type, answer_key = entry
+        result = grade_answer(question_type, answer, answer_key)
+        if result is None:
+            return None
+        score, correct = result
+        self.total_attempts += 1
+        if correct:
+            self.correct_answers += 1
+        feedback_text = format_result(score, correct, answer_key)
+        logging.info(f"题目 {question_index + 1} 本地评分：{score} 分")
+        self.record_feedback(question_index, question, feedback_text)
+        return feedback_text
+
+    def request_explanation(self):
+        """为已在本地评分的客观题请求模型讲解，讲解追加在评分结果之后"""
+        question_index = self.current_question_index
+        question = self.questions[question_index]
+        entry = answer_keys.get(question)
+        feedback_text = self.feedback.get(question_index, "")
+        if entry is None:
+            QMessageBox.information(self, "提示", "该题没有标准答案，请直接提交答案由模型评分。")
+            return
+        if not feedback_text:
+            QMessageBox.information(self, "提示", "请先提交答案。")
+            return
+        if EXPLANATION_HEADER in feedback_text:
+            return
+
+        self.question_prefetcher.set_paused(True)
+        self.start_feedback(
+            question_index, question, self.answers[question_index],
+            answer_key=entry[1], prefix=feedback_text + EXPLANATION_HEADER,
+        )
+
+    def start_feedback(self, question_index, question, answer, judge_report=None, answer_key=None, prefix=None,
+                       question_round=None):
+        """启动反馈线程；有本地评测结果时先显示评测结果，prefix 为已有反馈时追加在其后
+
+        question_round 为提交时的出题轮次，本地评测结束前已开始新一轮时不再请求评分。
+        """
+        if question_round is None:
+            question_round = self.question_round
+        if question_round != self.question_round:
+            logging.info(f"题目 {question_index + 1} 属于上一轮出题，不再请求评分")
+            if not self.running_threads and not self.batch_grader.is_running():
+                self.question_prefetcher.set_paused(False)
+            return
+        if question_index == self.current_question_index and prefix is None:
+            self.feedback_label.setText("等待反馈中...")
+
+        sink = FeedbackSink(question_index, parent=self)
+        sink.updated.connect(
+            lambda index, text: self.update_feedback_display(index, text, question_round)
+        )
+        if prefix:
+            sink.append(prefix)
+        if judge_report:
+            sink.append(judge_report + "\n\n")
 
         signals = WorkerSignals()
-        signals.result.connect(self.update_feedback_display)
-        signals.complete.connect(self.on_feedback_thread_complete)
+        signals.result.connect(sink.append)
         signals.error.connect(self.handle_task_error)
 
         try:
             task = FeedbackThread(
-                self.config, question, current_answer, signals
+                self.config, question, answer, signals, judge_report, answer_key
+            )
+            signals.complete.connect(
+                lambda: self.on_feedback_thread_complete(task, sink, question, answer, question_round)
             )
-            self.answers[self.current_question_index] = current_answer
-            self.timestamps[self.current_question_index][
-                "answer_time"
-            ] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             task.start()
             self.running_threads.append(task)
         except Exception as e:
             logging.error(f"启动反馈任务时出错: {e}")
             QMessageBox.warning(self, "错误", "启动反馈任务时出错，请重试。")
+            if not self.running_threads:
+                self.question_prefetcher.set_paused(False)
 
-    def update_feedback_display(self, feedback_part):
-        """更新反馈显示区域"""
-        current_text = self.feedback_label.text()
-        self.feedback_label.setText(current_text + feedback_part)
-        self.feedback[self.current_question_index] = self.feedback_label.text()
-        self.timestamps[self.current_question_index][
-            "feedback_time"
-        ] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def update_feedback_display(self, question_index, feedback_text, question_round):
+        """更新反馈显示区域（由 FeedbackSink 按帧合并后调用），忽略上一轮出题的反馈"""
+        if question_round != self.question_round:
+            return
+        self.feedback[question_index] = feedback_text
+        if question_index == self.current_question_index:
+            self.feedback_label.setText(feedback_text)
+
+    def on_feedback_thread_complete(self, task, sink, question, answer, question_round):
+        """反馈完成后记录反馈时间并保存一条记录，然后移除线程
+
+        上一轮出题的反馈只保存到记录文件，不写入当前这一轮同一题号的反馈。
+        """
+        question_index = sink.question_index
+        feedback_text = sink.finish()
+        sink.deleteLater()
+
+        if feedback_text and question_round == self.question_round:
+            self.record_feedback(question_index, question, feedback_text)
+        elif feedback_text:
+            feedback_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.file_manager.add_to_save_buffer(question, answer, feedback_text, "", "", feedback_time)
+
+        if task in self.running_threads:
+            self.running_threads.remove(task)
+        if not self.running_threads and not self.batch_grader.is_running():
+            self.question_prefetcher.set_paused(False)
+
+    def record_feedback(self, question_index, question, feedback_text):
+        """记录反馈时间并把一条记录加入保存队列"""
+        self.feedback[question_index] = feedback_text
+        timestamps = self.timestamps.setdefault(question_index, {})
+        timestamps["feedback_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         # 将数据添加到保存队列
         self.file_manager.add_to_save_buffer(
-            self.questions[self.current_question_index],
-            self.answers.get(self.current_question_index, "无答案"),
-            self.feedback.get(self.current_question_index, "无反馈"),
-            self.timestamps.get(self.current_question_index, {}).get("question_time", ""),
-            self.timestamps.get(self.current_question_index, {}).get("answer_time", ""),
-            self.timestamps.get(self.current_question_index, {}).get("feedback_time", ""),
+            question,
+            self.answers.get(question_index, "无答案"),
+            feedback_text,
+            timestamps.get("question_time", ""),
+            timestamps.get("answer_time", ""),
+            timestamps.get("feedback_time", ""),
         )
 
-    def on_feedback_thread_complete(self):
-        """反馈线程完成后，从运行线程列表中移除"""
-        sender = self.sender()
-        if sender in self.running_threads:
-            self.running_threads.remove(sender)
-
     def display_next_question(self):
         """显示当前的题目"""
         # 检查题目类型，如果是编程题，替换编辑器
@@ -616,6 +995,9 @@ class ExamApp(QWidget):
             f"题目 {self.current_question_index + 1}: {question_text}"
         )
 
+        if self.config.question_type == "编程题" and self.current_question_index in self.answer_languages:
+            self.code_language_combo.setCurrentText(self.answer_languages[self.current_question_index])
+
         if self.current_question_index in self.answers:
             if self.config.question_type == "编程题":
                 self.current_editor.setText(self.answers[self.current_question_index])
@@ -632,14 +1014,32 @@ class ExamApp(QWidget):
     def go_to_previous_question(self):
         """切换到上一题"""
         if self.current_question_index > 0:
+            self.store_current_answer()
             self.current_question_index -= 1
             self.display_next_question()
 
+    def go_to_question(self, question_index):
+        """跳转到指定题目（从批量评分结果表双击时调用）"""
+        if 0 <= question_index < len(self.questions):
+            self.store_current_answer()
+            self.current_question_index = question_index
+            self.display_next_question()
+
     def go_to_next_question(self):
-        """切换到下一题"""
+        """切换到下一题，已是最后一题时从预取缓冲区取一道新题"""
+        self.store_current_answer()
         if self.current_question_index < len(self.questions) - 1:
             self.current_question_index += 1
             self.display_next_question()
+        elif self.questions and not self.question_scheduler.is_running():
+            prefetched = self.question_prefetcher.take(1)
+            self.question_prefetcher.fill()
+            if not prefetched:
+                self.status_bar.showMessage("下一题正在后台生成，请稍候", 3000)
+                return
+            self.add_question(prefetched[0])
+            self.current_question_index += 1
+            self.display_next_question()
 
     def show_context_menu(self, position):
         """右键菜单，增加复制粘贴功能"""
@@ -680,18 +1080,37 @@ class ExamApp(QWidget):
             self.code_editor.setMarginLineNumbers(1, True)  # 显示行号
             self.code_editor.setAutoCompletionThreshold(2)  # 自动补全
             self.code_editor.setAutoCompletionSource(QsciScintilla.AcsAll)
+            self.change_code_language()
 
         self.left_layout.replaceWidget(self.answer_edit, self.code_editor)
         self.answer_edit.hide()
         self.code_editor.show()
+        self.code_language_combo.show()
         self.current_editor = self.code_editor
 
+    def change_code_language(self):
+        """切换编程题答案语言时同步代码编辑器的语法高亮"""
+        if not hasattr(self, 'code_editor'):
+            return
+        language = self.code_language_combo.currentText()
+        if language == "JavaScript":
+            lexer = QsciLexerJavaScript()
+        elif language == "C#":
+            lexer = QsciLexerCSharp()
+        elif language == "C++":
+            from PyQt5.Qsci import QsciLexerCPP
+            lexer = QsciLexerCPP()
+        else:
+            lexer = QsciLexerPython()
+        self.code_editor.setLexer(lexer)
+
     def use_text_editor(self):
         """使用普通文本编辑器"""
         if hasattr(self, 'code_editor') and self.code_editor.isVisible():
             self.left_layout.replaceWidget(self.code_editor, self.answer_edit)
             self.code_editor.hide()
             self.answer_edit.show()
+        self.code_language_combo.hide()
         self.current_editor = self.answer_edit
 
     def open_settings_dialog(self):
@@ -719,6 +1138,7 @@ class ExamApp(QWidget):
         """打开模型设置对话框"""
         dialog = ModelSettingsDialog(self.config, self)
         dialog.exec_()
+        self.question_prefetcher.refresh()
 
     def provide_real_time_feedback(self):
         """实时提供反馈（示例，简单地统计字数）"""
@@ -730,23 +1150,47 @@ class ExamApp(QWidget):
         self.status_bar.showMessage(f"当前字数：{word_count}")
 
     def export_data(self):
-        """导出数据到 Excel 文件"""
+        """在后台线程中导出数据，支持 Excel、CSV、JSON Lines 和 Parquet"""
         file_path, _ = QFileDialog.getSaveFileName(
-            self, "导出数据", "", "Excel Files (*.xlsx)"
+            self,
+            "导出数据",
+            "",
+            "Excel Files (*.xlsx);;CSV Files (*.csv);;JSON Lines (*.jsonl);;Parquet Files (*.parquet)",
+        )
+        if not file_path:
+            return
+
+        # 导出任务会先等待后台写入线程把保存队列写入数据库
+        task = self.file_manager.export_to_file(file_path)
+
+        progress_dialog = QProgressDialog("正在导出数据...", "取消", 0, 100, self)
+        progress_dialog.setWindowTitle("导出数据")
+        progress_dialog.setAutoClose(False)
+        progress_dialog.canceled.connect(task.cancel)
+        task.signals.progress.connect(progress_dialog.setValue)
+        task.signals.result.connect(
+            lambda path: QMessageBox.information(self, "导出成功", "数据已成功导出！")
+        )
+        task.signals.error.connect(
+            lambda message: QMessageBox.warning(self, "导出失败", "数据导出失败，请重试。")
         )
-        if file_path:
-            try:
-                self.file_manager.export_to_file(file_path)
-                QMessageBox.information(self, "导出成功", "数据已成功导出！")
-            except Exception as e:
-                logging.error(f"导出失败: {e}")
-                QMessageBox.warning(self, "导出失败", "数据导出失败，请重试。")
+        task.signals.complete.connect(progress_dialog.close)
+        progress_dialog.show()
+        QThreadPool.globalInstance().start(task)
 
     def closeEvent(self, event):
         """在窗口关闭时释放资源"""
         self.timer.stop()
         self.save_timer.stop()
-        self.save_buffer_to_file()
+        self.question_scheduler.shutdown()
+        self.question_prefetcher.shutdown()
+        self.batch_grader.shutdown()
+        self.file_manager.close()
+        QThreadPool.globalInstance().waitForDone()
+        warm_workers.shutdown()
+        extraction_pool.shutdown()
+        llm_caller.shutdown()
+        telemetry.flush()
 
         # 等待所有线程结束
         for thread in self.running_threads:
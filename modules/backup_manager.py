@@ -0,0 +1,180 @@
+import os
+import sys
+import glob
+import gzip
+import json
+import shutil
+import sqlite3
+import logging
+import time
+from datetime import datetime
+from PyQt5.QtCore import QRunnable, pyqtSlot
+
+from .worker_signals import WorkerSignals
+from .log_store import LogStore, COLUMNS
+
+# modules/backup_manager.py
+
+class BackupManager:
+    """答题记录的增量备份
+
+    每天生成一次压缩的完整快照，其余时间只把上次备份之后新增的记录写成压缩的
+    增量段；数据没有变化时跳过本次备份。保留最近 keep_full 个完整快照及其后的增量段。
+    """
+
+    def __init__(self, store, backup_dir="backups", full_interval=24 * 3600, keep_full=7):
+        self.store = store
+        self.backup_dir = backup_dir
+        self.full_interval = full_interval
+        self.keep_full = keep_full
+        self.state_file = os.path.join(backup_dir, "state.json")
+
+    def run(self):
+        """执行一次备份，返回描述本次结果的文字"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        state = self.load_state()
+        max_id = self.store.max_id()
+        if max_id == state["last_id"] and self.list_full():
+            logging.info("数据无变化，跳过备份")
+            return "数据无变化，跳过备份"
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        if not self.list_full() or time.time() - state["last_full"] >= self.full_interval:
+            self.write_full(stamp, max_id)
+            state["last_full"] = time.time()
+            message = f"已生成完整备份（{max_id} 条记录）"
+        else:
+            count = self.write_incremental(stamp, state["last_id"], max_id)
+            message = f"已生成增量备份（{count} 条新记录）"
+        state["last_id"] = max_id
+        self.save_state(state)
+        self.prune()
+        logging.info(message)
+        return message
+
+    def write_full(self, stamp, max_id):
+        """通过 SQLite 在线备份生成快照并压缩"""
+        temp_file = os.path.join(self.backup_dir, f"full-{stamp}.sqlite3.tmp")
+        source = self.store.connect()
+        target = sqlite3.connect(temp_file)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        with open(temp_file, "rb") as src, gzip.open(temp_file + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(temp_file)
+        os.replace(temp_file + ".gz", os.path.join(self.backup_dir, f"full-{stamp}-{max_id}.sqlite3.gz"))
+
+    def write_incremental(self, stamp, last_id, max_id):
+        """把 last_id 之后的新记录写成压缩的 JSON Lines 段"""
+        path = os.path.join(self.backup_dir, f"incr-{stamp}-{last_id + 1}-{max_id}.jsonl.gz")
+        count = 0
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            for row in self.store.iter_records(after_id=last_id, up_to_id=max_id):
+                record = dict(zip(("id",) + COLUMNS, row))
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        os.replace(path + ".tmp", path)
+        return count
+
+    def prune(self):
+        """按保留策略删除过期的快照和增量段"""
+        fulls = self.list_full()
+        for path in fulls[:-self.keep_full]:
+            os.remove(path)
+        kept = fulls[-self.keep_full:]
+        if not kept:
+            return
+        oldest_id = self.parse_full_id(kept[0])
+        for path in self.list_incremental():
+            if self.parse_incremental_range(path)[1] <= oldest_id:
+                os.remove(path)
+
+    def restore(self, target_file):
+        """用最新快照加其后的增量段还原出数据库文件 target_file"""
+        fulls = self.list_full()
+        if not fulls:
+            raise FileNotFoundError("没有可用的完整备份")
+        latest = fulls[-1]
+        full_id = self.parse_full_id(latest)
+        with gzip.open(latest, "rb") as src, open(target_file, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+
+        conn = sqlite3.connect(target_file)
+        restored = 0
+        try:
+            with conn:
+                for path in self.list_incremental():
+                    if self.parse_incremental_range(path)[1] <= full_id:
+                        continue
+                    with gzip.open(path, "rt", encoding="utf-8") as f:
+                        for line in f:
+                            record = json.loads(line)
+                            conn.execute(
+                                f"INSERT OR IGNORE INTO records (id, {', '.join(COLUMNS)}) "
+                                f"VALUES (?, {', '.join('?' * len(COLUMNS))})",
+                                [record["id"]] + [record[column] for column in COLUMNS],
+                            )
+                            restored += 1
+        finally:
+            conn.close()
+        logging.info(f"已从 {latest} 及 {restored} 条增量记录还原到 {target_file}")
+        return target_file
+
+    def list_full(self):
+        return sorted(glob.glob(os.path.join(self.backup_dir, "full-*.sqlite3.gz")))
+
+    def list_incremental(self):
+        return sorted(glob.glob(os.path.join(self.backup_dir, "incr-*.jsonl.gz")))
+
+    @staticmethod
+    def parse_full_id(path):
+        return int(os.path.basename(path).split(".")[0].rsplit("-", 1)[1])
+
+    @staticmethod
+    def parse_incremental_range(path):
+        parts = os.path.basename(path).split(".")[0].split("-")
+        return int(parts[-2]), int(parts[-1])
+
+    def load_state(self):
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"last_id": 0, "last_full": 0}
+
+    def save_state(self, state):
+        temp_file = self.state_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temp_file, self.state_file)
+
+
+class BackupTask(QRunnable):
+    """在线程池中执行一次备份，避免阻塞界面"""
+
+    def __init__(self, backup_manager):
+        super().__init__()
+        self.backup_manager = backup_manager
+        self.signals = WorkerSignals()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            self.signals.result.emit(self.backup_manager.run())
+        except Exception as e:
+            logging.error(f"数据备份失败: {e}")
+            self.signals.error.emit(f"数据备份失败: {e}")
+        finally:
+            self.signals.complete.emit()
+
+
+if __name__ == "__main__":
+    # 用法: python -m modules.backup_manager restore [目标文件]
+    if len(sys.argv) >= 2 and sys.argv[1] == "restore":
+        target = sys.argv[2] if len(sys.argv) > 2 else "all_questions_log_restored.sqlite3"
+        manager = BackupManager(LogStore("all_questions_log.sqlite3"))
+        print(f"已还原到 {manager.restore(target)}")
+    else:
+        print("用法: python -m modules.backup_manager restore [目标文件]")
@@ -0,0 +1,128 @@
+import re
+import time
+import logging
+from PyQt5.QtCore import QObject, QThreadPool, pyqtSignal
+
+from .worker_signals import WorkerSignals
+from .feedback_thread import FeedbackTask
+
+# modules/batch_grader.py
+
+SCORE_PATTERN = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*分")
+
+
+def extract_score(feedback_text):
+    """从反馈文本中取出第一个 0-100 的分数，找不到时返回 None"""
+    for match in SCORE_PATTERN.finditer(feedback_text):
+        score = float(match.group(1))
+        if 0 <= score <= 100:
+            return score
+    return None
+
+
+class BatchGrader(QObject):
+    """批量评分
+
+    把所有已作答的题目交给固定大小的线程池并发评分，并发数为 config.max_concurrency。
+    每道题的反馈按题号收集，完成后通过 graded(题号, 反馈, 耗时) 发出，
+    不依赖界面当前显示的是哪一道题。progress(已完成数, 总数) 报告整体进度。
+    任务按自增的 task_id 记录，题号只作为数据保存，取消后开始的新一轮即使题号相同，
+    也不会收到上一轮仍在运行的任务的结果。
+    """
+
+    graded = pyqtSignal(int, str, float)
+    failed = pyqtSignal(int, str)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
+
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self.pool = QThreadPool(self)
+        self.active_tasks = {}
+        self.cancelled_tasks = {}
+        self.parts = {}
+        self.errors = {}
+        self.started = {}
+        self.total = 0
+        self.done = 0
+        self.next_task_id = 0
+
+    def is_running(self):
+        return bool(self.active_tasks)
+
+    def start(self, items, languages=None):
+        """items 为 [(题号, 题目, 答案)]，languages 为编程题答案所用的语言 {题号: 语言}"""
+        languages = languages or {}
+        self.pool.setMaxThreadCount(max(1, self.config.max_concurrency))
+        self.total = len(items)
+        self.done = 0
+        logging.info(f"批量评分 {self.total} 道题目，并发上限 {self.pool.maxThreadCount()}")
+        for question_index, question, answer in items:
+            task_id = self.next_task_id
+            self.next_task_id += 1
+            signals = WorkerSignals()
+            task = FeedbackTask(
+                self.config, question, answer, signals, judge=True,
+                language=languages.get(question_index, "Python"),
+            )
+            task.setAutoDelete(False)
+            signals.result.connect(
+                lambda text, task_id=task_id: self.on_task_result(task_id, text)
+            )
+            signals.error.connect(
+                lambda message, task_id=task_id: self.on_task_error(task_id, message)
+            )
+            signals.complete.connect(
+                lambda task_id=task_id: self.on_task_complete(task_id)
+            )
+            self.active_tasks[task_id] = (question_index, task)
+            self.parts[task_id] = []
+            self.started[task_id] = time.monotonic()
+            self.pool.start(task)
+        self.progress.emit(0, self.total)
+
+    def on_task_result(self, task_id, text):
+        if task_id in self.active_tasks:
+            self.parts[task_id].append(text)
+
+    def on_task_error(self, task_id, message):
+        if task_id in self.active_tasks:
+            self.errors[task_id] = message
+
+    def on_task_complete(self, task_id):
+        self.cancelled_tasks.pop(task_id, None)
+        entry = self.active_tasks.pop(task_id, None)
+        if entry is None:
+            return
+        question_index, _ = entry
+        elapsed = time.monotonic() - self.started.pop(task_id)
+        feedback_text = "".join(self.parts.pop(task_id, []))
+        error = self.errors.pop(task_id, None)
+        if error and not feedback_text:
+            self.failed.emit(question_index, error)
+        else:
+            self.graded.emit(question_index, feedback_text, elapsed)
+        self.done += 1
+        self.progress.emit(self.done, self.total)
+        if not self.active_tasks:
+            logging.info(f"批量评分完成，共 {self.done} 道题目")
+            self.finished.emit()
+
+    def cancel(self):
+        """取消尚未开始的评分，运行中的评分结果将被丢弃"""
+        had_tasks = bool(self.active_tasks)
+        for task_id, (_, task) in self.active_tasks.items():
+            if not self.pool.tryTake(task):
+                # 已在运行，保留引用直到其结束，结果不再计入
+                self.cancelled_tasks[task_id] = task
+        self.active_tasks.clear()
+        self.parts.clear()
+        self.errors.clear()
+        self.started.clear()
+        if had_tasks:
+            self.finished.emit()
+
+    def shutdown(self):
+        self.cancel()
+        self.pool.waitForDone()
@@ -0,0 +1,87 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QLabel, QProgressBar, QTableWidget, QTableWidgetItem, QHeaderView, QPushButton
+)
+from PyQt5.QtCore import pyqtSignal
+
+from .batch_grader import extract_score
+
+class BatchResultsDialog(QDialog):
+    """批量评分的进度和结果表，双击某一行跳转到对应题目"""
+
+    question_selected = pyqtSignal(int)
+
+    def __init__(self, items, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("批量评分结果")
+        self.resize(800, 500)
+        self.rows = {}
+        self.local_done = 0
+        self.init_ui(items)
+
+    def init_ui(self, items):
+        layout = QVBoxLayout(self)
+
+        self.summary_label = QLabel(f"正在评分 {len(items)} 道题目...", self)
+        layout.addWidget(self.summary_label)
+
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setMaximum(len(items))
+        self.progress_bar.setValue(0)
+        layout.addWidget(self.progress_bar)
+
+        self.table = QTableWidget(len(items), 4, self)
+        self.table.setHorizontalHeaderLabels(["题号", "题目", "得分", "状态"])
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        for row, (question_index, question, _) in enumerate(items):
+            self.rows[question_index] = row
+            self.table.setItem(row, 0, QTableWidgetItem(str(question_index + 1)))
+            self.table.setItem(row, 1, QTableWidgetItem(" ".join(question.split())[:80]))
+            self.table.setItem(row, 2, QTableWidgetItem("-"))
+            self.table.setItem(row, 3, QTableWidgetItem("评分中"))
+        self.table.cellDoubleClicked.connect(
+            lambda row, column: self.question_selected.emit(int(self.table.item(row, 0).text()) - 1)
+        )
+        layout.addWidget(self.table)
+
+        close_button = QPushButton("关闭", self)
+        close_button.clicked.connect(self.close)
+        layout.addWidget(close_button)
+
+        self.setLayout(layout)
+
+    def set_progress(self, done, total):
+        """done/total 只统计交给模型评分的题目，需加上已在本地评分的题目"""
+        done += self.local_done
+        total += self.local_done
+        self.progress_bar.setValue(done)
+        self.summary_label.setText(f"已完成 {done}/{total} 道题目")
+
+    def set_local_graded(self, question_index, feedback_text):
+        row = self.rows[question_index]
+        score = extract_score(feedback_text)
+        self.table.item(row, 2).setText("-" if score is None else f"{score:g}")
+        self.table.item(row, 3).setText("本地评分")
+        self.local_done += 1
+        self.progress_bar.setValue(self.local_done)
+
+    def set_graded(self, question_index, feedback_text, elapsed):
+        row = self.rows[question_index]
+        score = extract_score(feedback_text)
+        self.table.item(row, 2).setText("-" if score is None else f"{score:g}")
+        self.table.item(row, 3).setText(f"完成（{elapsed:.1f} 秒）")
+
+    def set_failed(self, question_index, message):
+        row = self.rows[question_index]
+        self.table.item(row, 3).setText("失败")
+        self.table.item(row, 3).setToolTip(message)
+
+    def set_finished(self):
+        scores = [
+            extract_score(self.table.item(row, 2).text() + "分")
+            for row in range(self.table.rowCount())
+        ]
+        scores = [score for score in scores if score is not None]
+        average = f"，平均得分 {sum(scores) / len(scores):.1f}" if scores else ""
+        self.summary_label.setText(f"评分完成，共 {self.table.rowCount()} 道题目{average}")
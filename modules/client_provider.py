@@ -0,0 +1,142 @@
+import logging
+from contextlib import contextmanager
+import httpx
+from PyQt5.QtCore import QMutex
+from zhipuai import ZhipuAI
+
+# modules/client_provider.py
+
+class ZhipuClientProvider:
+    """进程级 ZhipuAI 客户端提供者
+
+    同一 API 密钥下所有任务共享一个客户端及其 keep-alive 连接池，
+    避免每次请求都重新构造客户端和进行 TLS 握手。
+    使用客户端前调用 acquire（或 lease），用完调用 release；密钥变化或 reset 后，
+    旧客户端等到仍在使用它的请求全部结束后才关闭。
+    """
+
+    def __init__(self, max_connections=20, keepalive_expiry=60.0):
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.mutex = QMutex()
+        self.api_key = None
+        self.client = None
+        self.http_client = None
+        # 客户端 -> 正在使用它的请求数
+        self.leases = {}
+        # 已被替换、等待请求结束后关闭的客户端 -> 其 HTTP 客户端
+        self.retired = {}
+        self.client_builds = 0
+        self.requests_sent = 0
+        self.connections_opened = 0
+
+    def acquire(self, api_key):
+        """返回与 api_key 对应的共享客户端并登记一次使用，密钥变化时才重建"""
+        self.mutex.lock()
+        try:
+            if self.client is None or self.api_key != api_key:
+                self._retire()
+                self.http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                        keepalive_expiry=self.keepalive_expiry,
+                    ),
+                    event_hooks={"request": [self._on_request]},
+                )
+                # 重试由 llm_caller 统一处理，关闭 SDK 自带的重试以免重试次数叠加
+                self.client = ZhipuAI(api_key=api_key, http_client=self.http_client, max_retries=0)
+                self.api_key = api_key
+                self.client_builds += 1
+                logging.info("已创建共享 ZhipuAI 客户端")
+            self.leases[self.client] = self.leases.get(self.client, 0) + 1
+            return self.client
+        finally:
+            self.mutex.unlock()
+
+    def release(self, client):
+        """结束一次使用；已被替换的客户端在最后一次使用结束时关闭"""
+        self.mutex.lock()
+        try:
+            count = self.leases.get(client, 0) - 1
+            if count > 0:
+                self.leases[client] = count
+                return
+            self.leases.pop(client, None)
+            http_client = self.retired.pop(client, None)
+        finally:
+            self.mutex.unlock()
+        if http_client is not None:
+            self._close(http_client)
+
+    @contextmanager
+    def lease(self, api_key):
+        """在 with 块内使用共享客户端"""
+        client = self.acquire(api_key)
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def reset(self):
+        """停用当前客户端，下次请求时按新密钥重建；进行中的请求不受影响"""
+        self.mutex.lock()
+        try:
+            self._retire()
+        finally:
+            self.mutex.unlock()
+
+    def stats(self):
+        """返回客户端和连接复用统计
+
+        connections_opened 为新建的 TCP 连接数，其余请求复用了 keep-alive 连接。
+        """
+        self.mutex.lock()
+        try:
+            return {
+                "client_builds": self.client_builds,
+                "requests_sent": self.requests_sent,
+                "connections_opened": self.connections_opened,
+                "connections_reused": max(0, self.requests_sent - self.connections_opened),
+            }
+        finally:
+            self.mutex.unlock()
+
+    def _on_request(self, request):
+        # httpcore 通过 trace 扩展报告连接事件，据此统计新建的连接
+        request.extensions.setdefault("trace", self._on_trace)
+        self.mutex.lock()
+        try:
+            self.requests_sent += 1
+        finally:
+            self.mutex.unlock()
+
+    def _on_trace(self, event, info):
+        if event == "connection.connect_tcp.complete":
+            self.mutex.lock()
+            try:
+                self.connections_opened += 1
+            finally:
+                self.mutex.unlock()
+
+    def _retire(self):
+        """调用方需持有 mutex：没有进行中的请求时立即关闭当前客户端，否则留待 release 关闭"""
+        if self.client is None:
+            return
+        if self.leases.get(self.client):
+            self.retired[self.client] = self.http_client
+        else:
+            self._close(self.http_client)
+        self.http_client = None
+        self.client = None
+        self.api_key = None
+
+    @staticmethod
+    def _close(http_client):
+        try:
+            http_client.close()
+        except Exception as e:
+            logging.error(f"关闭 HTTP 客户端时出错: {e}")
+
+
+client_provider = ZhipuClientProvider()
@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from PyQt5.QtCore import QRunnable, pyqtSlot
+
+from .worker_signals import WorkerSignals
+from .response_cache import response_cache
+from .token_budget import estimate_tokens, usage_tracker
+from .model_router import model_router
+from .llm_caller import llm_caller
+from .warm_workers import warm_workers
+
+try:
+    import resource
+except ImportError:  # Windows 上没有 resource 模块，只能限制墙钟时间
+    resource = None
+
+# modules/code_judge.py
+#
+# run_case 在子进程中执行，必须定义在模块顶层以便序列化。
+
+# 修改测试用例生成提示词时递增，使旧缓存失效
+TEST_PROMPT_VERSION = 1
+
+# 各语言的运行方式：源文件名和运行命令
+JUDGE_LANGUAGES = {
+    "Python": {"source": "main.py", "command": [sys.executable, "main.py"]},
+    "JavaScript": {"source": "main.js", "command": ["node", "main.js"]},
+}
+
+
+def judge_env():
+    """用例进程的环境变量：只保留启动解释器所需的变量
+
+    Windows 上缺少 SYSTEMROOT 时 Python 无法启动，缺少 TEMP/TMP 时临时文件无处可写。
+    """
+    names = ["PATH"]
+    if os.name == "nt":
+        names += ["SYSTEMROOT", "TEMP", "TMP", "PATHEXT", "COMSPEC"]
+    return {name: os.environ[name] for name in names if name in os.environ}
+
+
+def normalize_output(text):
+    """比较输出时忽略行尾空白和末尾空行"""
+    return "\n".join(line.rstrip() for line in text.replace("\r\n", "\n").strip().split("\n"))
+
+
+def limit_resources(cpu_seconds, memory_bytes):
+    """在子进程 exec 之前设置 CPU 时间、内存和输出文件大小上限"""
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    if memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (10 * 1024 * 1024, 10 * 1024 * 1024))
+
+
+def run_case(language, code, case_input, expected, time_limit, memory_limit):
+    """在独立的临时目录中运行一个测试用例，返回结果字典"""
+    settings = JUDGE_LANGUAGES[language]
+    workspace = tempfile.mkdtemp(prefix="exam_judge_")
+    try:
+        with open(os.path.join(workspace, settings["source"]), "w", encoding="utf-8") as f:
+            f.write(code)
+        with open(os.path.join(workspace, "input.txt"), "w", encoding="utf-8") as f:
+            f.write(case_input)
+
+        # node 会预留大量虚拟内存，对其只限制堆大小而不限制地址空间
+        command = list(settings["command"])
+        memory_bytes = memory_limit * 1024 * 1024
+        if language == "JavaScript":
+            command.insert(1, f"--max-old-space-size={memory_limit}")
+            memory_bytes = None
+
+        preexec = None
+        if resource is not None:
+            preexec = lambda: limit_resources(int(time_limit) + 1, memory_bytes)
+
+        started = time.monotonic()
+        with open(os.path.join(workspace, "input.txt"), "rb") as stdin, \
+                open(os.path.join(workspace, "output.txt"), "wb") as stdout, \
+                open(os.path.join(workspace, "error.txt"), "wb") as stderr:
+            process = subprocess.Popen(
+                command, cwd=workspace, stdin=stdin, stdout=stdout, stderr=stderr,
+                preexec_fn=preexec, env=judge_env(),
+            )
+            timed_out = threading.Event()
+
+            def kill():
+                timed_out.set()
+                process.kill()
+
+            timer = threading.Timer(time_limit, kill)
+            timer.start()
+            try:
+                if hasattr(os, "wait4"):
+                    # wait4 返回该子进程自己的资源占用，可以得到峰值内存
+                    _, status, usage = os.wait4(process.pid, 0)
+                    process.returncode = os.waitstatus_to_exitcode(status)
+                    memory_kb = usage.ru_maxrss
+                else:
+                    process.wait()
+                    memory_kb = None
+            finally:
+                timer.cancel()
+        elapsed_ms = (time.monotonic() - started) * 1000
+
+        with open(os.path.join(workspace, "output.txt"), "r", encoding="utf-8", errors="replace") as f:
+            output = f.read()
+        with open(os.path.join(workspace, "error.txt"), "r", encoding="utf-8", errors="replace") as f:
+            error = f.read()
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    # 超出 CPU 时间上限时进程收到 SIGXCPU（24）
+    timed_out = timed_out.is_set() or process.returncode == -24
+    return judge_result(process.returncode, timed_out, output, error, expected, elapsed_ms, memory_kb)
+
+
+def judge_result(exit_code, timed_out, output, error, expected, time_ms, memory_kb):
+    """根据运行结果判定用例状态"""
+    if timed_out:
+        status = "超时"
+    elif exit_code != 0:
+        status = "超出内存" if "MemoryError" in error or "heap out of memory" in error else "运行错误"
+    elif normalize_output(output) == normalize_output(expected):
+        status = "通过"
+    else:
+        status = "答案错误"
+    return {
+        "passed": status == "通过",
+        "status": status,
+        "time_ms": round(time_ms),
+        "memory_kb": memory_kb,
+        "output": output[:200],
+        "error": error[-300:],
+    }
+
+
+def format_report(cases, results):
+    """把评测结果整理为可读文本，同时用于界面显示和评分提示词"""
+    passed = sum(1 for result in results if result["passed"])
+    lines = [f"本地评测：通过 {passed}/{len(results)} 个测试用例"]
+    for index, (case, result) in enumerate(zip(cases, results), start=1):
+        memory = f"{result['memory_kb'] / 1024:.1f} MB" if result["memory_kb"] else "未知"
+        line = f"用例 {index}：{result['status']}，用时 {result['time_ms']} ms，峰值内存 {memory}"
+        if result["status"] == "答案错误":
+            line += f"\n  输入：{case['input'][:100]!r}\n  期望：{case['output'][:100]!r}\n  实际：{result['output'][:100]!r}"
+        elif result["status"] in ("运行错误", "超出内存") and result["error"]:
+            line += f"\n  错误信息：{result['error'].strip()[-200:]}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class JudgeTask(QRunnable):
+    """本地评测编程题答案
+
+    language 必须是 JUDGE_LANGUAGES 中的语言，其他语言的答案无法在本地运行，
+    调用方应跳过评测而不是按 Python 运行。先让模型为题目生成标准输入/输出形式的测试用例（结果写入响应缓存，同一题目
+    重复提交时用例不变），再并行运行各用例：有常驻工作进程时交给工作进程，
+    否则在进程池中逐个启动解释器。每个用例在独立的临时目录中运行，
+    受 CPU 时间、内存和墙钟时间限制，记录是否通过、耗时和峰值内存。
+    完成后 signals.result 发出评测报告文本。
+    """
+
+    def __init__(self, config, question, code, language="Python", num_cases=5,
+                 time_limit=2.0, memory_limit=256, max_workers=None):
+        super().__init__()
+        if language not in JUDGE_LANGUAGES:
+            raise ValueError(f"本地评测不支持 {language}")
+        self.config = config
+        self.question = question
+        self.code = code
+        self.language = language
+        self.num_cases = num_cases
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+        self.max_workers = max_workers
+        self.signals = WorkerSignals()
+        self.created = time.monotonic()
+        self.queue_wait = None
+
+    @pyqtSlot()
+    def run(self):
+        self.queue_wait = time.monotonic() - self.created
+        try:
+            self.signals.result.emit(self.judge())
+        except Exception as e:
+            logging.error(f"本地评测失败: {e}")
+            self.signals.error.emit(f"本地评测失败: {e}")
+        finally:
+            self.signals.complete.emit()
+
+    def judge(self):
+        """生成用例并运行，返回评测报告文本"""
+        cases = self.generate_cases()
+        if not cases:
+            raise ValueError("未能生成测试用例")
+        results = self.run_cases(cases)
+        report = format_report(cases, results)
+        logging.info(report)
+        return report
+
+    def run_cases(self, cases):
+        """并行运行所有用例，结果顺序与 cases 一致"""
+        pool = warm_workers.get_pool(self.language)
+        if pool is not None:
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                futures = [executor.submit(self.run_warm_case, pool, case) for case in cases]
+                return [future.result() for future in futures]
+
+        with ProcessPoolExecutor(max_workers=self.max_workers or min(len(cases), os.cpu_count() or 1)) as executor:
+            futures = [
+                executor.submit(
+                    run_case, self.language, self.code, case["input"], case["output"],
+                    self.time_limit, self.memory_limit,
+                )
+                for case in cases
+            ]
+            return [future.result() for future in futures]
+
+    def run_warm_case(self, pool, case):
+        result = pool.run(self.code, case["input"], self.time_limit)
+        return judge_result(
+            result["exit_code"], result["timed_out"], result["stdout"], result["stderr"],
+            case["output"], result["time_ms"], result["memory_kb"],
+        )
+
+    def generate_cases(self):
+        """请求模型生成测试用例，返回 [{"input": ..., "output": ...}]"""
+        prompt = (
+            f"请为以下编程题设计{self.num_cases}组测试用例，程序从标准输入读取数据并向标准输出打印结果。"
+            "测试用例应覆盖普通情况和边界情况，期望输出必须完全正确。"
+            '\n只输出 JSON，不要输出其他内容，格式为：{"tests": [{"input": "输入", "output": "期望输出"}]}。'
+            f"\n题目：{self.question}"
+        )
+        model_name = model_router.route(self.config, "出题", "编程题", estimate_tokens(prompt))
+        key = response_cache.make_key(model_name, TEST_PROMPT_VERSION, prompt)
+        content = response_cache.get(key) if self.config.cache_enabled else None
+        if content is None:
+            response = llm_caller.create(
+                self.config, model_name, [{"role": "user", "content": prompt}],
+                kind="测试用例", queue_wait=self.queue_wait,
+            )
+            usage_tracker.record(model_name, "测试用例", estimate_tokens(prompt), getattr(response, "usage", None))
+            content = response.choices[0].message.content.strip()
+            cases = self.parse_cases(content)
+            if cases and self.config.cache_enabled:
+                response_cache.put(key, content)
+            return cases
+        return self.parse_cases(content)
+
+    @staticmethod
+    def parse_cases(content):
+        """解析模型返回的测试用例，格式不符时返回空列表"""
+        start, end = content.find("{"), content.rfind("}")
+        if start == -1 or end <= start:
+            return []
+        try:
+            data = json.loads(content[start:end + 1])
+        except ValueError:
+            return []
+        tests = data.get("tests") if isinstance(data, dict) else None
+        if not isinstance(tests, list):
+            return []
+        return [
+            {"input": str(test["input"]), "output": str(test["output"])}
+            for test in tests
+            if isinstance(test, dict) and "input" in test and "output" in test
+        ]
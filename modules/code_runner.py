@@ -0,0 +1,260 @@
+import os
+import time
+import codecs
+import locale
+import logging
+from PyQt5.QtCore import QObject, QProcess, QTimer, QMutex, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+# modules/code_runner.py
+
+class CodeRunner(QObject):
+    """以 QProcess 异步运行代码，不阻塞界面线程
+
+    stdout/stderr 一有输出就通过 output 信号发出。可选的编译命令先执行，
+    编译成功后再运行程序。运行阶段受墙钟时间和 CPU 时间限制（CPU 限制通过
+    ulimit 实现，仅在类 Unix 系统上生效），输出超过 max_output_chars 时也会终止进程。
+    编译成功时发出 compiled 信号；结束时 finished 信号给出退出码、耗时（秒）和状态说明。
+    """
+
+    output = pyqtSignal(str)
+    compiled = pyqtSignal()
+    finished = pyqtSignal(int, float, str)
+
+    def __init__(self, wall_timeout=10.0, cpu_timeout=5, compile_timeout=60.0,
+                 max_output_chars=200000, working_dir=None, parent=None):
+        super().__init__(parent)
+        self.wall_timeout = wall_timeout
+        self.cpu_timeout = cpu_timeout
+        self.compile_timeout = compile_timeout
+        self.max_output_chars = max_output_chars
+        self.working_dir = working_dir
+        self.process = None
+        self.steps = []
+        self.status = ""
+        self.output_chars = 0
+        self.started = 0.0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+
+    def is_running(self):
+        return self.process is not None
+
+    def run(self, command, compile_command=None):
+        """运行 command；提供 compile_command 时先编译，编译失败则不再运行"""
+        if self.is_running():
+            raise RuntimeError("上一次运行尚未结束")
+        self.steps = []
+        if compile_command:
+            self.steps.append((compile_command, self.compile_timeout, False))
+        self.steps.append((command, self.wall_timeout, True))
+        self.output_chars = 0
+        self.started = time.monotonic()
+        self.start_next_step()
+
+    def stop(self):
+        """用户手动停止"""
+        if self.is_running():
+            self.status = "已停止"
+            self.process.kill()
+
+    def start_next_step(self):
+        command, timeout, limited = self.steps.pop(0)
+        self.status = ""
+        encoding = locale.getpreferredencoding(False)
+        self.decoders = {
+            QProcess.StandardOutput: codecs.getincrementaldecoder(encoding)(errors="replace"),
+            QProcess.StandardError: codecs.getincrementaldecoder(encoding)(errors="replace"),
+        }
+
+        self.process = QProcess(self)
+        if self.working_dir:
+            self.process.setWorkingDirectory(self.working_dir)
+        self.process.readyReadStandardOutput.connect(lambda: self.read_channel(QProcess.StandardOutput))
+        self.process.readyReadStandardError.connect(lambda: self.read_channel(QProcess.StandardError))
+        self.process.finished.connect(self.on_finished)
+        self.process.errorOccurred.connect(self.on_error)
+
+        if limited and self.cpu_timeout and os.name == "posix":
+            # 在子 shell 中设置 CPU 时间上限后再 exec 目标程序
+            command = ["/bin/sh", "-c", f'ulimit -t {int(self.cpu_timeout)}; exec "$@"', "sh"] + list(command)
+        self.process.start(command[0], list(command[1:]))
+        # 不提供标准输入，避免程序等待输入而一直挂起
+        self.process.closeWriteChannel()
+        self.timer.start(int(timeout * 1000))
+
+    def read_channel(self, channel):
+        if self.process is None:
+            return
+        self.process.setReadChannel(channel)
+        data = bytes(self.process.readAll())
+        text = self.decoders[channel].decode(data)
+        if not text:
+            return
+        self.output_chars += len(text)
+        if self.output_chars > self.max_output_chars:
+            if not self.status:
+                self.status = "输出过多，已终止"
+                self.process.kill()
+            return
+        self.output.emit(text)
+
+    def on_timeout(self):
+        if self.is_running():
+            self.status = "运行超时，已终止"
+            self.process.kill()
+
+    def on_error(self, error):
+        # 程序无法启动时不会发出 finished 信号，需要在这里结束
+        if error == QProcess.FailedToStart and self.process is not None:
+            self.status = f"无法启动程序: {self.process.errorString()}"
+            self.finish(-1)
+
+    def on_finished(self, exit_code, exit_status):
+        if self.process is None:
+            return
+        self.read_channel(QProcess.StandardOutput)
+        self.read_channel(QProcess.StandardError)
+        if not self.status and exit_status == QProcess.CrashExit:
+            # ulimit 的 CPU 时间上限通过 SIGXCPU/SIGKILL 终止进程
+            self.status = "程序异常终止（可能超出 CPU 时间限制）"
+        if exit_code == 0 and exit_status == QProcess.NormalExit and self.steps:
+            self.timer.stop()
+            self.process.deleteLater()
+            self.process = None
+            self.compiled.emit()
+            self.start_next_step()
+            return
+        if not self.status and self.steps:
+            self.status = "编译失败"
+        self.finish(exit_code)
+
+    def finish(self, exit_code):
+        self.timer.stop()
+        self.process.deleteLater()
+        self.process = None
+        self.steps = []
+        elapsed = time.monotonic() - self.started
+        status = self.status or "运行完成"
+        logging.info(f"代码运行结束：{status}，退出码 {exit_code}，耗时 {elapsed:.2f} 秒")
+        self.finished.emit(exit_code, elapsed, status)
+
+
+class WarmCodeRunner(QObject):
+    """在常驻工作进程中运行 Python/JavaScript 代码，信号和接口与 CodeRunner 相同
+
+    运行在线程池中等待工作进程，输出一有新内容就通过 output 信号发出。
+    停止或输出超过 max_output_chars 时请工作进程杀掉本次运行；墙钟时间、CPU 时间和内存
+    由工作进程按 wall_timeout 和工作进程池的内存上限限制。工作进程都在忙时排队等待。
+    """
+
+    output = pyqtSignal(str)
+    compiled = pyqtSignal()
+    finished = pyqtSignal(int, float, str)
+
+    def __init__(self, pool, wall_timeout=10.0, max_output_chars=200000, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.wall_timeout = wall_timeout
+        self.max_output_chars = max_output_chars
+        self.mutex = QMutex()
+        self.running = False
+        self.worker = None
+        self.status = ""
+        self.output_chars = 0
+        self.started = 0.0
+
+    def is_running(self):
+        return self.running
+
+    def run(self, code):
+        """在线程池中运行 code"""
+        if self.is_running():
+            raise RuntimeError("上一次运行尚未结束")
+        self.running = True
+        self.status = ""
+        self.output_chars = 0
+        self.started = time.monotonic()
+        QThreadPool.globalInstance().start(WarmRunTask(self, code))
+
+    def stop(self):
+        """用户手动停止"""
+        self.cancel("已停止")
+
+    def cancel(self, status):
+        """记录终止原因，已取得工作进程时请其杀掉本次运行"""
+        self.mutex.lock()
+        try:
+            if not self.running or self.status:
+                return
+            self.status = status
+            if self.worker is not None:
+                self.worker.cancel()
+        finally:
+            self.mutex.unlock()
+
+    def execute(self, code):
+        """在线程池中执行：取得工作进程、运行并等待结果"""
+        worker = self.pool.acquire()
+        self.mutex.lock()
+        try:
+            # 排队期间已经停止时不再运行
+            stopped = bool(self.status)
+            if not stopped:
+                self.worker = worker
+        finally:
+            self.mutex.unlock()
+        result = None
+        try:
+            if not stopped:
+                result = self.pool.execute(worker, code, "", self.wall_timeout, on_output=self.on_output)
+        finally:
+            self.mutex.lock()
+            try:
+                self.worker = None
+            finally:
+                self.mutex.unlock()
+            self.pool.release(worker)
+        self.finish(result)
+
+    def on_output(self, stream, text):
+        self.output_chars += len(text)
+        if self.output_chars > self.max_output_chars:
+            self.cancel("输出过多，已终止")
+            return
+        self.output.emit(text)
+
+    def finish(self, result):
+        exit_code = -1 if result is None else result["exit_code"]
+        if self.status:
+            status = self.status
+        elif result.get("crashed"):
+            status = f"工作进程出错: {result['stderr']}"
+        elif result["timed_out"]:
+            status = "运行超时，已终止"
+        elif exit_code < 0:
+            status = "程序异常终止"
+        else:
+            status = "运行完成"
+        elapsed = time.monotonic() - self.started
+        logging.info(f"代码运行结束：{status}，退出码 {exit_code}，耗时 {elapsed:.2f} 秒")
+        self.running = False
+        self.finished.emit(exit_code, elapsed, status)
+
+
+class WarmRunTask(QRunnable):
+    """WarmCodeRunner 在线程池中的一次运行"""
+
+    def __init__(self, runner, code):
+        super().__init__()
+        self.runner = runner
+        self.code = code
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            self.runner.execute(self.code)
+        except Exception as e:
+            logging.error(f"代码运行失败: {e}")
+            self.runner.running = False
+            self.runner.finished.emit(-1, 0.0, f"运行失败: {e}")
@@ -0,0 +1,103 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+from PyQt5.QtCore import QMutex
+
+# modules/compile_cache.py
+
+EXE_SUFFIX = ".exe" if os.name == "nt" else ""
+
+# 需要编译的语言：编译器、编译选项以及工作目录中的源文件名和可执行文件名
+COMPILE_SETTINGS = {
+    "C++": {"compiler": "g++", "flags": [], "source": "program.cpp", "binary": "program" + EXE_SUFFIX},
+    "C#": {"compiler": "csc", "flags": [], "source": "Program.cs", "binary": "Program.exe"},
+}
+
+
+def build_command(language, source_path, binary_path):
+    """生成编译命令"""
+    settings = COMPILE_SETTINGS[language]
+    if language == "C#":
+        return [settings["compiler"], *settings["flags"], source_path, f"/out:{binary_path}"]
+    return [settings["compiler"], *settings["flags"], source_path, "-o", binary_path]
+
+
+class CompileCache:
+    """编译结果缓存
+
+    以 (源代码, 编译器路径及其修改时间, 编译选项) 的哈希为键保存编译出的可执行文件，
+    源代码未变时直接运行缓存中的程序，不再重新编译。缓存条目写入后不再修改，
+    多个窗口可以同时运行同一个缓存程序。总大小超过 max_bytes 时按最近最少使用顺序淘汰。
+    """
+
+    def __init__(self, cache_dir=".compile_cache", max_bytes=500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.mutex = QMutex()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(source, compiler, flags):
+        """根据源代码、编译器和编译选项生成缓存键"""
+        compiler_path = shutil.which(compiler) or compiler
+        try:
+            compiler_mtime = os.stat(compiler_path).st_mtime_ns
+        except OSError:
+            compiler_mtime = None
+        payload = json.dumps([source, os.path.realpath(compiler_path), compiler_mtime, list(flags)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key, binary_name):
+        """返回缓存的可执行文件路径，未命中时返回 None"""
+        path = self.path_for(key, binary_name)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # 更新修改时间，作为 LRU 的访问时间
+        except OSError:
+            pass
+        self.hits += 1
+        return os.path.abspath(path)
+
+    def put(self, key, binary_path):
+        """把编译出的可执行文件复制进缓存，并在超出容量时淘汰最久未使用的条目"""
+        self.mutex.lock()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.path_for(key, os.path.basename(binary_path))
+            shutil.copy2(binary_path, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            self.evict()
+        except OSError as e:
+            logging.error(f"写入编译缓存失败: {e}")
+        finally:
+            self.mutex.unlock()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                # Windows 上正在运行的程序无法删除，留到下次淘汰
+                continue
+            total -= size
+
+    def path_for(self, key, binary_name):
+        _, suffix = os.path.splitext(binary_name)
+        return os.path.join(self.cache_dir, key + suffix)
+
+
+compile_cache = CompileCache()
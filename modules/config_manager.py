@@ -18,6 +18,17 @@ class ConfigManager:
         self.file_content = ""
         self.api_key = ""
         self.model_name = "glm-4-plus"
+        self.max_concurrency = 3
+        self.batch_size = 5
+        self.context_chars = 6000
+        self.cache_enabled = True
+        self.routing_enabled = True
+        self.model_overrides = {"出题": "自动", "评分": "自动"}
+        self.prefetch_depth = 5
+        self.request_timeout = 60
+        self.max_retries = 3
+        # 对冲请求会重复消耗 token，默认关闭
+        self.hedging_enabled = False
         self.load_user_config()
 
     def load_user_config(self):
@@ -32,6 +43,16 @@ class ConfigManager:
                 self.question_type = config.get("question_type", self.question_type)
                 self.api_key = config.get("api_key", self.api_key)
                 self.model_name = config.get("model_name", self.model_name)
+                self.max_concurrency = config.get("max_concurrency", self.max_concurrency)
+                self.batch_size = config.get("batch_size", self.batch_size)
+                self.context_chars = config.get("context_chars", self.context_chars)
+                self.cache_enabled = config.get("cache_enabled", self.cache_enabled)
+                self.routing_enabled = config.get("routing_enabled", self.routing_enabled)
+                self.model_overrides = dict(self.model_overrides, **config.get("model_overrides", {}))
+                self.prefetch_depth = config.get("prefetch_depth", self.prefetch_depth)
+                self.request_timeout = config.get("request_timeout", self.request_timeout)
+                self.max_retries = config.get("max_retries", self.max_retries)
+                self.hedging_enabled = config.get("hedging_enabled", self.hedging_enabled)
         else:
             self.save_user_config()
 
@@ -45,6 +66,16 @@ class ConfigManager:
             "question_type": self.question_type,
             "api_key": self.api_key,
             "model_name": self.model_name,
+            "max_concurrency": self.max_concurrency,
+            "batch_size": self.batch_size,
+            "context_chars": self.context_chars,
+            "cache_enabled": self.cache_enabled,
+            "routing_enabled": self.routing_enabled,
+            "model_overrides": self.model_overrides,
+            "prefetch_depth": self.prefetch_depth,
+            "request_timeout": self.request_timeout,
+            "max_retries": self.max_retries,
+            "hedging_enabled": self.hedging_enabled,
         }
         with open(self.config_file, "w", encoding="utf-8") as f:
             json.dump(config, f, ensure_ascii=False, indent=4)
@@ -0,0 +1,164 @@
+import os
+import csv
+import json
+import logging
+from PyQt5.QtCore import QRunnable, pyqtSlot
+
+from .worker_signals import WorkerSignals
+from .log_store import COLUMNS, HEADERS
+
+# modules/data_exporter.py
+
+EXPORT_FORMATS = {
+    ".xlsx": "xlsx",
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".parquet": "parquet",
+}
+
+
+class ExportCancelled(Exception):
+    """导出被用户取消"""
+
+
+class DataExporter:
+    """答题记录的流式导出
+
+    逐行从 LogStore 读取并直接写出，内存占用与历史记录总量无关。
+    支持 Excel（constant_memory 模式）、CSV、JSON Lines 和 Parquet。
+    """
+
+    def __init__(self, store, parquet_batch_size=1000):
+        self.store = store
+        self.parquet_batch_size = parquet_batch_size
+
+    def export(self, file_path, start_time=None, end_time=None, predicate=None,
+               progress=None, is_cancelled=None):
+        """导出记录到 file_path，返回导出的行数
+
+        start_time / end_time 按生成时间（"%Y-%m-%d %H:%M:%S"）筛选，
+        predicate 接收记录字典，返回 False 的记录不导出。
+        """
+        fmt = EXPORT_FORMATS.get(os.path.splitext(file_path)[1].lower())
+        if fmt is None:
+            raise ValueError(f"不支持的导出格式: {file_path}")
+
+        total = self.store.count(start_time, end_time)
+        state = {"read": 0, "percent": -1}
+
+        def records():
+            for row in self.store.iter_rows(start_time, end_time):
+                if is_cancelled is not None and is_cancelled():
+                    raise ExportCancelled()
+                state["read"] += 1
+                if progress is not None and total:
+                    percent = state["read"] * 100 // total
+                    if percent != state["percent"]:
+                        state["percent"] = percent
+                        progress(percent)
+                record = dict(zip(COLUMNS, row))
+                if predicate is None or predicate(record):
+                    yield record
+
+        temp_file = file_path + ".part"
+        try:
+            written = getattr(self, f"write_{fmt}")(temp_file, records())
+            os.replace(temp_file, file_path)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        logging.info(f"已导出 {written} 条记录到 {file_path}")
+        return written
+
+    def write_xlsx(self, file_path, records):
+        import xlsxwriter
+
+        workbook = xlsxwriter.Workbook(file_path, {"constant_memory": True})
+        try:
+            worksheet = workbook.add_worksheet()
+            for col, header in enumerate(HEADERS):
+                worksheet.write(0, col, header)
+            count = 0
+            for count, record in enumerate(records, start=1):
+                for col, column in enumerate(COLUMNS):
+                    worksheet.write(count, col, record[column])
+        finally:
+            workbook.close()
+        return count
+
+    def write_csv(self, file_path, records):
+        count = 0
+        # utf-8-sig 便于 Excel 直接识别中文
+        with open(file_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADERS)
+            for record in records:
+                writer.writerow([record[column] for column in COLUMNS])
+                count += 1
+        return count
+
+    def write_jsonl(self, file_path, records):
+        count = 0
+        with open(file_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    def write_parquet(self, file_path, records):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([(column, pa.string()) for column in COLUMNS])
+        count = 0
+        batch = []
+        with pq.ParquetWriter(file_path, schema) as writer:
+            for record in records:
+                batch.append(record)
+                count += 1
+                if len(batch) >= self.parquet_batch_size:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    batch = []
+            if batch or count == 0:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        return count
+
+
+class ExportTask(QRunnable):
+    """在线程池中执行导出，通过 signals 报告进度，可随时取消
+
+    before 为导出前在后台线程中调用的函数（如等待保存队列写入数据库）。
+    """
+
+    def __init__(self, exporter, file_path, before=None, **filters):
+        super().__init__()
+        self.exporter = exporter
+        self.file_path = file_path
+        self.before = before
+        self.filters = filters
+        self.cancelled = False
+        self.signals = WorkerSignals()
+
+    def cancel(self):
+        """请求取消导出，已写出的部分文件会被删除"""
+        self.cancelled = True
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            if self.before is not None and not self.before():
+                logging.warning("部分答题记录尚未写入数据库，导出结果可能不完整")
+            self.exporter.export(
+                self.file_path,
+                progress=self.signals.progress.emit,
+                is_cancelled=lambda: self.cancelled,
+                **self.filters,
+            )
+            self.signals.result.emit(self.file_path)
+        except ExportCancelled:
+            logging.info(f"导出到 {self.file_path} 已取消")
+        except Exception as e:
+            logging.error(f"导出失败: {e}")
+            self.signals.error.emit(f"导出失败: {e}")
+        finally:
+            self.signals.complete.emit()
@@ -0,0 +1,224 @@
+import math
+import re
+import logging
+from array import array
+from collections import Counter
+from PyQt5.QtCore import QMutex
+
+from .document_source import DocumentHandle
+
+# modules/document_index.py
+
+WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+|[\u4e00-\u9fff]+")
+CJK_PATTERN = re.compile(r"[\u4e00-\u9fff]+")
+# 建立索引时每读取这么多个磁盘分段归还一次映射页
+RELEASE_INTERVAL = 256
+
+
+def tokenize(text):
+    """分词：英文按单词，中文按相邻两字切分"""
+    tokens = []
+    for word in WORD_PATTERN.findall(text):
+        if CJK_PATTERN.fullmatch(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+class DocumentIndex:
+    """资料分块索引
+
+    上传资料后将全文切分为若干段落块并建立 BM25 索引，每次出题只取出
+    最少被使用的块及与其最相关的块，使提示词长度不随资料大小增长。
+    分块可以是内存中的字符串，也可以是 DocumentHandle 中的分段编号（按需读取）；
+    每个分块只保留词频最高的 max_terms 个词，索引大小与分块数成正比。
+
+    词语统一登记在共享词表中，各分块只以紧凑数组保存词编号和词频：
+    第 i 个分块的词位于 term_ids[term_offsets[i]:term_offsets[i + 1]]。
+    词表达到 max_vocabulary 后不再登记新词，乱码等高熵资料也不会撑大内存。
+    """
+
+    def __init__(self, chunk_size=800, k1=1.5, b=0.75, max_terms=32, max_vocabulary=200_000):
+        self.chunk_size = chunk_size
+        self.k1 = k1
+        self.b = b
+        self.max_terms = max_terms
+        self.max_vocabulary = max_vocabulary
+        self.mutex = QMutex()
+        self.handle = None
+        self.chunks = []
+        self.chunk_chars = array("I")
+        self.vocabulary = {}
+        self.doc_freqs = array("I")
+        self.term_offsets = array("I", [0])
+        self.term_ids = array("I")
+        self.term_counts = array("H")
+        self.chunk_lengths = array("I")
+        self.avg_length = 0
+        self.coverage = array("I")
+
+    def build(self, text):
+        """切分内存中的资料文本并重建索引"""
+        handle = DocumentHandle()
+        handle.add_text(text)
+        self.build_handle(handle)
+
+    def build_handle(self, handle):
+        """根据资料句柄重建索引，磁盘分段只记录编号，不保留文本"""
+        chunks = []
+        chunk_chars, chunk_lengths = array("I"), array("I")
+        vocabulary, doc_freqs = {}, array("I")
+        term_offsets, term_ids, term_counts = array("I", [0]), array("I"), array("H")
+        for index, segment in enumerate(handle.segments):
+            if isinstance(segment, str):
+                pieces = [(piece, piece) for piece in self.split(segment)]
+            else:
+                text = handle.text(index)
+                pieces = [(index, text)] if text.strip() else []
+                # 已读过的映射页交还给系统，避免整个文件都计入进程内存
+                if index % RELEASE_INTERVAL == 0:
+                    handle.release_pages()
+            for ref, text in pieces:
+                freqs = Counter(tokenize(text))
+                chunk_lengths.append(min(sum(freqs.values()), 0xFFFFFFFF))
+                for term, count in freqs.most_common(self.max_terms):
+                    term_id = vocabulary.get(term)
+                    if term_id is None:
+                        if len(vocabulary) >= self.max_vocabulary:
+                            continue
+                        term_id = vocabulary[term] = len(doc_freqs)
+                        doc_freqs.append(0)
+                    doc_freqs[term_id] += 1
+                    term_ids.append(term_id)
+                    term_counts.append(min(count, 0xFFFF))
+                term_offsets.append(len(term_ids))
+                chunks.append(ref)
+                chunk_chars.append(len(text))
+        handle.release_pages()
+
+        self.mutex.lock()
+        try:
+            if self.handle is not None and self.handle is not handle:
+                self.handle.close()
+            self.handle = handle
+            self.chunks = chunks
+            self.chunk_chars = chunk_chars
+            self.vocabulary = vocabulary
+            self.doc_freqs = doc_freqs
+            self.term_offsets = term_offsets
+            self.term_ids = term_ids
+            self.term_counts = term_counts
+            self.chunk_lengths = chunk_lengths
+            self.avg_length = (
+                sum(self.chunk_lengths) / len(self.chunk_lengths) if self.chunk_lengths else 0
+            )
+            self.coverage = array("I", bytes(4 * len(self.chunks)))
+            logging.info(f"资料索引已建立，共 {len(self.chunks)} 个分块")
+        finally:
+            self.mutex.unlock()
+
+    def chunk_text(self, chunk_id):
+        """返回分块文本，磁盘分段按需读取"""
+        ref = self.chunks[chunk_id]
+        return ref if isinstance(ref, str) else self.handle.text(ref)
+
+    def split(self, text):
+        """按段落聚合为不超过 chunk_size 字符的分块，超长段落再按长度切开"""
+        chunks = []
+        current = []
+        current_len = 0
+        for paragraph in text.split("\n"):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            while len(paragraph) > self.chunk_size:
+                chunks.append(paragraph[:self.chunk_size])
+                paragraph = paragraph[self.chunk_size:]
+            if current_len + len(paragraph) > self.chunk_size and current:
+                chunks.append("\n".join(current))
+                current = []
+                current_len = 0
+            current.append(paragraph)
+            current_len += len(paragraph) + 1
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def is_empty(self):
+        """索引中是否没有任何分块"""
+        return not self.chunks
+
+    def chunk_terms(self, chunk_id):
+        """返回分块保留的词编号"""
+        return self.term_ids[self.term_offsets[chunk_id]:self.term_offsets[chunk_id + 1]]
+
+    def term_weights(self, term_ids):
+        """计算查询中各词编号的 IDF 权重，重复出现的词按次数累加"""
+        n = len(self.chunks)
+        weights = {}
+        for term_id in term_ids:
+            df = self.doc_freqs[term_id]
+            weights[term_id] = weights.get(term_id, 0.0) + math.log(1 + (n - df + 0.5) / (df + 0.5))
+        return weights
+
+    def score(self, weights, chunk_id):
+        """计算查询与分块的 BM25 得分，weights 为 term_weights 的结果"""
+        length_norm = 1 - self.b + self.b * self.chunk_lengths[chunk_id] / (self.avg_length or 1)
+        total = 0.0
+        for pos in range(self.term_offsets[chunk_id], self.term_offsets[chunk_id + 1]):
+            idf = weights.get(self.term_ids[pos])
+            if idf is None:
+                continue
+            tf = self.term_counts[pos]
+            total += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        return total
+
+    def search_tokens(self, query_tokens, top_k=5):
+        """按分词结果检索最相关的分块编号"""
+        term_ids = [self.vocabulary[token] for token in query_tokens if token in self.vocabulary]
+        return self.search_terms(term_ids, top_k)
+
+    def search_terms(self, term_ids, top_k=5):
+        """按词编号检索最相关的分块编号"""
+        weights = self.term_weights(term_ids)
+        if not weights:
+            return []
+        scored = [(self.score(weights, i), i) for i in range(len(self.chunks))]
+        scored = [item for item in scored if item[0] > 0]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [i for _, i in scored[:top_k]]
+
+    def take_context(self, max_chars):
+        """取出一段出题上下文
+
+        以被使用次数最少的分块为起点，先补充与其最相关且较少使用的分块，
+        再补充其余较少使用的分块，总长度不超过 max_chars，并记录各分块的使用次数。
+        """
+        self.mutex.lock()
+        try:
+            if not self.chunks:
+                return ""
+            seed = min(range(len(self.chunks)), key=lambda i: (self.coverage[i], i))
+            selected = [seed]
+            used = self.chunk_chars[seed]
+            related = self.search_terms(self.chunk_terms(seed), top_k=len(self.chunks))
+            related.sort(key=lambda i: self.coverage[i])
+            # 相关分块不足以填满预算时，再按使用次数补充其余分块
+            fallback = sorted(range(len(self.chunks)), key=lambda i: (self.coverage[i], i))
+            for chunk_id in related + fallback:
+                if chunk_id in selected:
+                    continue
+                if used + self.chunk_chars[chunk_id] > max_chars:
+                    continue
+                selected.append(chunk_id)
+                used += self.chunk_chars[chunk_id]
+            for chunk_id in selected:
+                self.coverage[chunk_id] += 1
+            selected.sort()
+            return "\n".join(self.chunk_text(i) for i in selected)[:max_chars]
+        finally:
+            self.mutex.unlock()
@@ -0,0 +1,237 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from PyQt5.QtCore import QMutex, QRunnable, pyqtSlot
+
+from .worker_signals import WorkerSignals
+from .extraction_cache import extraction_cache
+from .document_source import DocumentHandle, iter_file_ranges, normalize_text
+
+# modules/document_loader.py
+#
+# 提取函数在子进程中执行，必须定义在模块顶层以便序列化。
+
+# 修改提取或规范化逻辑时递增，使旧的提取缓存失效
+EXTRACTOR_VERSION = 1
+
+
+def extract_file(file_name):
+    """提取非 PDF 文件的文本"""
+    if file_name.endswith(".txt"):
+        with open(file_name, "r", encoding="utf-8") as f:
+            return f.read()
+    if file_name.endswith(".docx"):
+        import docx
+
+        doc = docx.Document(file_name)
+        return "\n".join(para.text for para in doc.paragraphs)
+    # 尝试以文本方式读取未知类型的文件
+    with open(file_name, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def extract_pdf_pages(file_name, start, end):
+    """提取 PDF 第 start 页到第 end 页（不含）的文本"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file_name)
+    return "\n".join(reader.pages[i].extract_text() or "" for i in range(start, end))
+
+
+def pdf_page_count(file_name):
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(file_name).pages)
+
+
+def plan_file_jobs(file_name, pages_per_job):
+    """把单个文件拆分为提取任务：普通文件一个任务，PDF 按页码区间拆分"""
+    if not file_name.endswith(".pdf"):
+        return [(extract_file, (file_name,))]
+    page_count = pdf_page_count(file_name)
+    return [
+        (extract_pdf_pages, (file_name, start, min(start + pages_per_job, page_count)))
+        for start in range(0, page_count, pages_per_job)
+    ]
+
+
+def is_streamable(file_name, threshold):
+    """大于 threshold 字节的纯文本文件以内存映射方式按段读取，不整体载入内存"""
+    if file_name.endswith((".pdf", ".docx")):
+        return False
+    return os.path.getsize(file_name) >= threshold
+
+
+class ExtractionPool:
+    """各次上传共用的提取进程池，第一次使用时创建，子进程崩溃导致进程池损坏时重建"""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.mutex = QMutex()
+        self.executor = None
+
+    def get(self):
+        self.mutex.lock()
+        try:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self.executor
+        finally:
+            self.mutex.unlock()
+
+    def discard(self, executor):
+        """丢弃已损坏的进程池，下次使用时重建"""
+        self.mutex.lock()
+        try:
+            if self.executor is executor:
+                self.executor = None
+        finally:
+            self.mutex.unlock()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """退出时调用：丢弃排队中的任务，不等待正在运行的子进程"""
+        self.mutex.lock()
+        try:
+            executor, self.executor = self.executor, None
+        finally:
+            self.mutex.unlock()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+extraction_pool = ExtractionPool()
+
+
+class IngestTask(QRunnable):
+    """并行提取上传资料的文本
+
+    已提取过且未改动的文件直接从提取缓存读取，其余文件在共享的提取进程池中提取，
+    通过 signals.progress 报告百分比。超过 stream_threshold 的纯文本文件不读入内存，
+    只在 DocumentHandle 中记录字节区间。完成后 signals.result 发出内存中各文件
+    文本的拼接结果；提供 document_index 时用完整的句柄建立索引。
+    """
+
+    def __init__(self, file_names, document_index=None, pages_per_job=20,
+                 use_cache=True, stream_threshold=8 * 1024 * 1024, segment_bytes=2400, poll_interval=0.2):
+        super().__init__()
+        self.file_names = file_names
+        self.document_index = document_index
+        self.poll_interval = poll_interval
+        self.pages_per_job = pages_per_job
+        self.use_cache = use_cache
+        self.stream_threshold = stream_threshold
+        self.segment_bytes = segment_bytes
+        self.cancelled = False
+        self.signals = WorkerSignals()
+
+    def cancel(self):
+        """请求取消，尚未开始的提取任务不再执行"""
+        self.cancelled = True
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            handle = self.extract()
+            if handle is None:
+                logging.info("资料读取已取消")
+                return
+            if self.document_index is not None:
+                self.document_index.build_handle(handle)
+            text = "\n".join(segment for segment in handle.segments if isinstance(segment, str))
+            self.signals.result.emit(text + "\n" if text else "")
+        except Exception as e:
+            logging.error(f"文件上传失败: {e}")
+            self.signals.error.emit(f"文件上传失败: {e}")
+        finally:
+            self.signals.complete.emit()
+
+    def extract(self):
+        """提取全部文件，返回按上传顺序组织的 DocumentHandle，取消时返回 None"""
+        file_names = [name for name in self.file_names if os.path.exists(name)]
+        texts = [None] * len(file_names)
+        cache_keys = {}
+        jobs = []
+        for file_index, file_name in enumerate(file_names):
+            try:
+                if is_streamable(file_name, self.stream_threshold):
+                    texts[file_index] = list(iter_file_ranges(file_name, self.segment_bytes))
+                    continue
+                if self.use_cache:
+                    key = extraction_cache.make_key(file_name, EXTRACTOR_VERSION)
+                    cached = extraction_cache.get(key)
+                    if cached is not None:
+                        texts[file_index] = cached
+                        continue
+                    cache_keys[file_index] = key
+                for func, args in plan_file_jobs(file_name, self.pages_per_job):
+                    jobs.append((file_index, func, args))
+            except Exception as e:
+                logging.error(f"无法读取文件 {file_name}: {e}")
+
+        if jobs:
+            parts = self.run_jobs(jobs)
+            if parts is None:
+                return None
+            file_parts = {}
+            failed = set()
+            for (file_index, _, _), part in zip(jobs, parts):
+                if part is None:
+                    failed.add(file_index)
+                    part = ""
+                file_parts.setdefault(file_index, []).append(part)
+            for file_index, chunks in file_parts.items():
+                text = normalize_text("\n".join(chunks))
+                texts[file_index] = text
+                if file_index in cache_keys and file_index not in failed:
+                    extraction_cache.put(cache_keys[file_index], text)
+
+        handle = DocumentHandle()
+        for file_name, text in zip(file_names, texts):
+            if isinstance(text, list):
+                for offset, length in text:
+                    handle.add_file_range(file_name, offset, length)
+            elif text:
+                handle.add_text(text)
+        self.signals.progress.emit(100)
+        return handle
+
+    def run_jobs(self, jobs):
+        """在共享进程池中执行提取任务，返回与 jobs 顺序一致的结果（失败为 None），取消时返回 None
+
+        同时提交的任务不超过进程数的两倍，每次提交前和等待期间每隔 poll_interval 秒检查取消；
+        取消时撤回已提交但未开始的任务，正在运行的任务在后台结束，结果被丢弃。
+        """
+        parts = [None] * len(jobs)
+        executor = extraction_pool.get()
+        limit = extraction_pool.max_workers * 2
+        pending = {}
+        next_job = 0
+        finished = 0
+        try:
+            while next_job < len(jobs) or pending:
+                while next_job < len(jobs) and len(pending) < limit:
+                    if self.cancelled:
+                        return None
+                    _, func, args = jobs[next_job]
+                    pending[executor.submit(func, *args)] = next_job
+                    next_job += 1
+                done, _ = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                if self.cancelled:
+                    return None
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        parts[index] = future.result()
+                    except BrokenProcessPool:
+                        extraction_pool.discard(executor)
+                        raise
+                    except Exception as e:
+                        logging.error(f"无法读取文件 {jobs[index][2][0]}: {e}")
+                    finished += 1
+                    self.signals.progress.emit(finished * 100 // len(jobs))
+        finally:
+            for future in pending:
+                future.cancel()
+        return parts
@@ -0,0 +1,110 @@
+import os
+import mmap
+from PyQt5.QtCore import QMutex
+
+# modules/document_source.py
+
+# 扫描文件时每读过这么多字节归还一次映射页
+RELEASE_BYTES = 1 << 20
+
+class DocumentHandle:
+    """上传资料的句柄
+
+    资料由若干分段组成：小文件提取出的文本直接保存在内存中，大文本文件只记录
+    (文件名, 字节偏移, 字节长度)，需要时通过内存映射读取，不在内存中保留整段字符串。
+    """
+
+    def __init__(self):
+        self.segments = []
+        self.mutex = QMutex()
+        self.mapped = {}
+
+    def add_text(self, text):
+        """添加内存中的文本分段"""
+        self.segments.append(text)
+
+    def add_file_range(self, file_name, offset, length):
+        """添加磁盘文件中的一段字节区间"""
+        self.segments.append((file_name, offset, length))
+
+    def __len__(self):
+        return len(self.segments)
+
+    def text(self, index):
+        """读取第 index 个分段的规范化文本"""
+        segment = self.segments[index]
+        if isinstance(segment, str):
+            return segment
+        file_name, offset, length = segment
+        data = self.map_file(file_name)[offset:offset + length]
+        return normalize_text(data.decode("utf-8", errors="ignore"))
+
+    def map_file(self, file_name):
+        self.mutex.lock()
+        try:
+            if file_name not in self.mapped:
+                f = open(file_name, "rb")
+                self.mapped[file_name] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            return self.mapped[file_name][1]
+        finally:
+            self.mutex.unlock()
+
+    def release_pages(self):
+        """让系统回收所有映射中已读取的页"""
+        self.mutex.lock()
+        try:
+            for f, mapped in self.mapped.values():
+                release_pages(mapped)
+        finally:
+            self.mutex.unlock()
+
+    def close(self):
+        """释放所有内存映射"""
+        self.mutex.lock()
+        try:
+            for f, mapped in self.mapped.values():
+                mapped.close()
+                f.close()
+            self.mapped.clear()
+        finally:
+            self.mutex.unlock()
+
+
+def release_pages(mapped):
+    """让系统回收已读取的映射页，页面仍留在文件缓存中，再次读取时按需换入"""
+    if hasattr(mmap, "MADV_DONTNEED"):
+        mapped.madvise(mmap.MADV_DONTNEED)
+
+
+def normalize_text(text):
+    """统一换行符并去掉空字符和行尾空白"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\x00", "")
+    return "\n".join(line.rstrip() for line in text.split("\n"))
+
+
+def iter_file_ranges(file_name, segment_bytes):
+    """以内存映射方式扫描文件，产出不超过 segment_bytes 的 (偏移, 长度)
+
+    尽量在换行处切分，找不到换行时退回到 UTF-8 字符边界，避免切断多字节字符。
+    """
+    size = os.path.getsize(file_name)
+    if size == 0:
+        return
+    with open(file_name, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        pos = 0
+        released = 0
+        while pos < size:
+            # 扫描过的页及时归还，避免整个文件都计入进程内存
+            if pos - released >= RELEASE_BYTES:
+                release_pages(mapped)
+                released = pos
+            end = min(pos + segment_bytes, size)
+            if end < size:
+                newline = mapped.rfind(b"\n", pos, end)
+                if newline > pos:
+                    end = newline + 1
+                else:
+                    while end > pos + 1 and (mapped[end] & 0xC0) == 0x80:
+                        end -= 1
+            yield pos, end - pos
+            pos = end
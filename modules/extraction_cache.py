@@ -0,0 +1,83 @@
+import os
+import json
+import zlib
+import hashlib
+import logging
+from PyQt5.QtCore import QMutex
+
+# modules/extraction_cache.py
+
+class ExtractionCache:
+    """上传资料的文本提取缓存
+
+    以 (文件路径, 大小, 修改时间, inode, 提取器版本) 为键，把提取出的纯文本压缩后
+    保存在本地缓存目录中。总大小超过 max_bytes 时按最近最少使用顺序淘汰。
+    """
+
+    def __init__(self, cache_dir=".extract_cache", max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.mutex = QMutex()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(file_name, extractor_version):
+        """根据文件元数据和提取器版本生成缓存键"""
+        stat = os.stat(file_name)
+        payload = json.dumps([
+            os.path.realpath(file_name), stat.st_size, stat.st_mtime_ns, stat.st_ino, extractor_version,
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """读取缓存的文本，未命中时返回 None"""
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                text = zlib.decompress(f.read()).decode("utf-8")
+            os.utime(path)  # 更新修改时间，作为 LRU 的访问时间
+            self.hits += 1
+            return text
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            logging.error(f"读取提取缓存失败: {e}")
+            self.misses += 1
+            return None
+
+    def put(self, key, text):
+        """压缩写入缓存，并在超出容量时淘汰最久未使用的条目"""
+        self.mutex.lock()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.path_for(key)
+            with open(path + ".tmp", "wb") as f:
+                f.write(zlib.compress(text.encode("utf-8"), 6))
+            os.replace(path + ".tmp", path)
+            self.evict()
+        except OSError as e:
+            logging.error(f"写入提取缓存失败: {e}")
+        finally:
+            self.mutex.unlock()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".z"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.z")
+
+
+extraction_cache = ExtractionCache()
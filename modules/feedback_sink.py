@@ -0,0 +1,61 @@
+import time
+import logging
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+# modules/feedback_sink.py
+
+class FeedbackSink(QObject):
+    """流式反馈缓冲区
+
+    收集 FeedbackThread 逐段发出的反馈文本，按帧间隔合并刷新界面，
+    避免每收到一个片段就重建整段文本。同时统计 UI 线程在每个片段上的耗时。
+    """
+
+    updated = pyqtSignal(int, str)
+
+    def __init__(self, question_index, interval=16, parent=None):
+        super().__init__(parent)
+        self.question_index = question_index
+        self.parts = []
+        self.dirty = False
+        self.chunk_count = 0
+        self.ui_time = 0.0
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+
+    def append(self, chunk):
+        """接收一个反馈片段，只记录，不立即刷新界面"""
+        start = time.perf_counter()
+        self.parts.append(chunk)
+        self.chunk_count += 1
+        self.dirty = True
+        if not self.timer.isActive():
+            self.timer.start()
+        self.ui_time += time.perf_counter() - start
+
+    def flush(self):
+        """将缓冲区内容刷新到界面"""
+        if not self.dirty:
+            self.timer.stop()
+            return
+        start = time.perf_counter()
+        self.dirty = False
+        self.updated.emit(self.question_index, self.text())
+        self.ui_time += time.perf_counter() - start
+
+    def finish(self):
+        """反馈结束：最后刷新一次并返回完整文本"""
+        self.flush()
+        self.timer.stop()
+        if self.chunk_count:
+            per_chunk = self.ui_time / self.chunk_count * 1000
+            logging.info(
+                f"题目 {self.question_index + 1} 反馈共 {self.chunk_count} 个片段，"
+                f"UI 线程平均每片段耗时 {per_chunk:.3f} ms"
+            )
+        return self.text()
+
+    def text(self):
+        """当前已收到的完整反馈文本"""
+        return "".join(self.parts)
@@ -1,49 +1,105 @@
+import time
 import logging
-from PyQt5.QtCore import QThread, pyqtSlot
-from zhipuai import ZhipuAI
+from PyQt5.QtCore import QThread, QRunnable, pyqtSlot
 
 from .worker_signals import WorkerSignals
+from .response_cache import response_cache
+from .token_budget import estimate_tokens, fit_prompt, usage_tracker
+from .model_router import model_router
+from .llm_caller import llm_caller
+from .code_judge import JudgeTask, JUDGE_LANGUAGES
 
-class FeedbackThread(QThread):
-    """获取反馈的线程类"""
+# 修改评分提示词模板时递增，使旧缓存失效
+PROMPT_VERSION = 1
 
-    def __init__(self, config, question, answer, signals):
-        super().__init__()
+class FeedbackRequest:
+    """评分请求的公共逻辑，由 FeedbackThread 和 FeedbackTask 共用
+
+    提供 judge_report（编程题的本地评测结果）时，提示词要求模型结合评测结果评分。
+    提供 answer_key（客观题的标准答案，已在本地判分）时，只请求模型讲解题目，不再评分。
+    """
+
+    def setup(self, config, question, answer, signals, judge_report=None, answer_key=None):
         self.config = config
         self.question = question
         self.answer = answer
         self.signals = signals
-        self.client = ZhipuAI(api_key=self.config.api_key)
+        self.judge_report = judge_report
+        self.answer_key = answer_key
+        self.created = time.monotonic()
+        self.queue_wait = None
 
-    @pyqtSlot()
-    def run(self):
+    def request_feedback(self):
+        """请求评分，逐段通过 signals.result 发出反馈，结束时发出 complete"""
         try:
             logging.info(f"开始获取问题 {self.question} 的反馈...")
 
-            prompt = (
-                f"你是一名专业的教育评估专家，性格叛逆。请对以下{self.config.language}答案进行公正评分（0-100分），"
-                "并说明评分理由，同时提供正确答案。"
-                f"\n题目：{self.question}"
-                f"\n学生的回答：{self.answer}"
-            )
+            if self.answer_key:
+                template = (
+                    f"你是一名专业的{self.config.language}教师。以下题目已经评分，请不要再给出分数，"
+                    "只讲解解题思路和正确答案成立的原因，并指出学生回答中的错误（如有）。"
+                    "\n题目：{question}"
+                    "\n标准答案：{key}"
+                    "\n学生的回答：{answer}"
+                )
+                sections = [("answer", self.answer), ("question", self.question), ("key", self.answer_key)]
+            else:
+                template = (
+                    f"你是一名专业的教育评估专家，性格叛逆。请对以下{self.config.language}答案进行公正评分（0-100分），"
+                    "并说明评分理由，同时提供正确答案。"
+                    "\n题目：{question}"
+                    "\n学生的回答：{answer}"
+                )
+                sections = [("answer", self.answer), ("question", self.question)]
+            if self.judge_report:
+                template += (
+                    "\n以下是该代码在本地测试用例上的运行结果，请据此评价代码的正确性和性能："
+                    "\n{report}"
+                )
+                sections.insert(1, ("report", self.judge_report))
+            prompt_tokens = estimate_tokens(template) + sum(estimate_tokens(text) for _, text in sections)
+            model_name = model_router.route(self.config, "评分", self.config.question_type, prompt_tokens)
+            # 回答过长时优先压缩回答，其次压缩题目，使提示词不超出所选模型的预算
+            prompt, estimated = fit_prompt(model_name, template, sections)
 
-            response = self.client.chat.completions.create(
-                model=self.config.model_name,
-                messages=[
+            key = response_cache.make_key(model_name, PROMPT_VERSION, prompt)
+            if self.config.cache_enabled:
+                cached = response_cache.get(key)
+                if cached is not None:
+                    logging.info("反馈命中响应缓存")
+                    self.signals.result.emit(cached)
+                    return
+
+            response = llm_caller.stream(
+                self.config,
+                model_name,
+                [
                     {
                         "role": "user",
                         "content": prompt,
                     },
                 ],
-                stream=True,
+                kind="解析" if self.answer_key else "评分",
+                queue_wait=self.queue_wait,
             )
 
+            parts = []
+            usage = None
             for chunk in response:
+                # 流式响应的用量信息在最后一个数据块中
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
                 delta = chunk.choices[0].delta
                 content = getattr(delta, "content", "")
                 if content:
                     cleaned_content = self.clean_markdown(content)
+                    parts.append(cleaned_content)
                     self.signals.result.emit(cleaned_content)
+            usage_tracker.record(model_name, "解析" if self.answer_key else "评分", estimated, usage)
+
+            if self.config.cache_enabled and parts:
+                response_cache.put(key, "".join(parts))
 
         except Exception as e:
             logging.error(f"获取反馈时出错: {e}")
@@ -54,3 +110,41 @@ class FeedbackThread(QThread):
     def clean_markdown(self, text):
         """移除Markdown格式的符号，返回纯文本"""
         return text.replace("*", "").replace("#", "")
+
+
+class FeedbackThread(QThread, FeedbackRequest):
+    """获取反馈的线程类"""
+
+    def __init__(self, config, question, answer, signals, judge_report=None, answer_key=None):
+        super().__init__()
+        self.setup(config, question, answer, signals, judge_report, answer_key)
+
+    @pyqtSlot()
+    def run(self):
+        self.queue_wait = time.monotonic() - self.created
+        self.request_feedback()
+
+
+class FeedbackTask(QRunnable, FeedbackRequest):
+    """在线程池中获取反馈，用于批量评分
+
+    judge 为 True、当前题型为编程题且 language 可以在本地运行时，先在本地运行测试用例，
+    再带着评测结果评分。评测结果同时作为第一段反馈发出。
+    """
+
+    def __init__(self, config, question, answer, signals, judge=False, language="Python"):
+        super().__init__()
+        self.setup(config, question, answer, signals)
+        self.judge = judge
+        self.language = language
+
+    @pyqtSlot()
+    def run(self):
+        self.queue_wait = time.monotonic() - self.created
+        if self.judge and self.config.question_type == "编程题" and self.language in JUDGE_LANGUAGES:
+            try:
+                self.judge_report = JudgeTask(self.config, self.question, self.answer, self.language).judge()
+                self.signals.result.emit(self.judge_report + "\n\n")
+            except Exception as e:
+                logging.error(f"本地评测失败，改为直接评分: {e}")
+        self.request_feedback()
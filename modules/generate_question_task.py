@@ -1,49 +1,216 @@
+import json
+import time
 import logging
-from PyQt5.QtCore import QThread, pyqtSlot
-from zhipuai import ZhipuAI
+from PyQt5.QtCore import QRunnable, pyqtSlot
 
 from .worker_signals import WorkerSignals
+from .response_cache import response_cache
+from .token_budget import estimate_tokens, fit_prompt, usage_tracker
+from .model_router import model_router
+from .llm_caller import llm_caller
+from .local_grader import OBJECTIVE_TYPES, ANSWER_KEY_FORMATS, answer_keys
 
-class GenerateQuestionTask(QThread):
-    """生成问题的线程类"""
+# 修改出题提示词模板时递增，使旧缓存失效
+PROMPT_VERSION = 3
 
-    def __init__(self, config, question_history, callback):
+# 生成的题目与已有题目近似时，最多重新生成的轮数
+MAX_REGENERATIONS = 2
+
+class GenerateQuestionTask(QRunnable):
+    """生成问题的任务类，由 QuestionScheduler 的线程池执行
+
+    batch_size 大于 1 时，一次请求让模型以 JSON 返回多道题目；
+    若返回内容无法解析，则自动退回逐题请求。提供 document_index 时，
+    提示词只包含从索引中取出的部分资料，而不是全文。提供 deduplicator 时，
+    与已有题目近似的题目会被丢弃并重新生成，提示词中只包含已覆盖知识点的摘要。
+    客观题（选择、判断、填空）总是以 JSON 请求，并要求模型同时给出标准答案，
+    标准答案存入 answer_keys 供本地判分，不随题目发出。
+    """
+
+    def __init__(self, config, deduplicator=None, task_id=0, batch_size=1, document_index=None):
         super().__init__()
         self.config = config
-        self.question_history = question_history
-        self.callback = callback
+        self.deduplicator = deduplicator
+        self.task_id = task_id
+        self.batch_size = max(1, batch_size)
+        self.document_index = document_index
+        self.context = config.file_content
+        # 题型在创建任务时确定，任务执行期间用户切换题型不影响本任务的题目和标准答案
+        self.question_type = config.question_type
+        self.with_answer_key = self.question_type in OBJECTIVE_TYPES
         self.signals = WorkerSignals()
-        self.client = ZhipuAI(api_key=self.config.api_key)
+        self.created = time.monotonic()
+        self.queue_wait = None
 
     @pyqtSlot()
     def run(self):
         try:
-            logging.info("开始生成题目...")
-            difficulty_prompt = self.config.difficulty
-            question_type_prompt = self.config.question_type
-            lang_prompt = self.config.language
-
-            prompt = (
-                f"你是一名专业的出题教授，请根据以下内容生成一个{difficulty_prompt}的{lang_prompt}{question_type_prompt}，"
-                "要求题目专业严谨，不要提供答案，不要已生成的题目考察的内容相似。"
-                f"\n内容：{self.config.file_content}"
-                f"\n已生成的题目：\n{self.question_history}"
-            )
+            self.queue_wait = time.monotonic() - self.created
+            logging.info(f"开始生成题目（任务 {self.task_id}，共 {self.batch_size} 道）...")
+            if self.document_index is not None and not self.document_index.is_empty():
+                self.context = self.document_index.take_context(self.config.context_chars)
+            questions = self.accept(self.generate(self.batch_size))
+            attempts = 0
+            while len(questions) < self.batch_size and attempts < MAX_REGENERATIONS:
+                attempts += 1
+                missing = self.batch_size - len(questions)
+                logging.info(f"任务 {self.task_id} 有 {missing} 道题目与已有题目近似，重新生成")
+                questions += self.accept(self.generate(missing, use_cache=False))
 
-            response = self.client.chat.completions.create(
-                model=self.config.model_name,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-            )
-            question = response.choices[0].message.content.strip()
-            logging.info(f"成功生成题目: {question}")
-            self.signals.result.emit(question)
+            for question, answer_key in questions:
+                logging.info(f"成功生成题目: {question}")
+                if answer_key:
+                    answer_keys.put(question, answer_key, self.question_type)
+                self.signals.result.emit(question)
         except Exception as e:
             logging.error(f"生成题目时出错: {e}")
             self.signals.error.emit(f"生成题目时出错: {e}")
         finally:
             self.signals.complete.emit()
+
+    def generate(self, count, use_cache=True):
+        """生成 count 道题目，返回 [(题目, 标准答案)]；批量结果无法解析时退回逐题生成"""
+        if count > 1 or self.with_answer_key:
+            questions = self.generate_batch(count, use_cache)
+            if questions is not None:
+                return questions
+            logging.warning(f"批量生成结果解析失败，任务 {self.task_id} 改为逐题生成")
+        return self.generate_single_questions(count, use_cache)
+
+    def accept(self, questions):
+        """过滤掉与已有题目近似的题目"""
+        if self.deduplicator is None:
+            return questions
+        return [(question, answer_key) for question, answer_key in questions if self.deduplicator.try_add(question)]
+
+    def generate_batch(self, count, use_cache=True):
+        """一次请求生成 count 道题目，解析失败时返回 None"""
+        model_name, prompt = self.build_prompt(count)
+        content = self.request(
+            model_name,
+            prompt,
+            validate=lambda text: self.parse_batch(text, count) is not None,
+            use_cache=use_cache,
+        )
+        return self.parse_batch(content, count)
+
+    def generate_single_questions(self, count, use_cache=True):
+        """逐题请求生成题目，不带标准答案"""
+        questions = []
+        for _ in range(count):
+            model_name, prompt = self.build_prompt(1, as_json=False)
+            questions.append((self.request(model_name, prompt, use_cache=use_cache), None))
+        return questions
+
+    def covered_summary(self):
+        """已生成题目的摘要，用于提示模型避免重复"""
+        return self.deduplicator.summary() if self.deduplicator is not None else "无"
+
+    def build_prompt(self, count, as_json=None):
+        """选择模型并构造出题提示词，返回 (模型, 提示词)
+
+        as_json 为 None 时，批量或客观题使用 JSON 格式。
+        超出所选模型的 token 预算时先压缩资料，再压缩题目摘要。
+        """
+        difficulty_prompt = self.config.difficulty
+        question_type_prompt = self.question_type
+        lang_prompt = self.config.language
+
+        if as_json is None:
+            as_json = count > 1 or self.with_answer_key
+
+        if as_json and self.with_answer_key:
+            template = (
+                f"你是一名专业的出题教授，请根据以下内容生成{count}道{difficulty_prompt}的{lang_prompt}{question_type_prompt}，"
+                "要求题目专业严谨，各题之间以及与已生成的题目考察的内容不要相似。"
+                "题目正文中不要出现答案，每道题的标准答案单独写在 answer 字段中，"
+                f"标准答案格式：{ANSWER_KEY_FORMATS[question_type_prompt]}。"
+                '\n只输出 JSON，不要输出其他内容，格式为：'
+                f'{{"questions": [{{"question": "题目1", "answer": "标准答案1"}}]}}，数组长度必须为{count}。'
+            )
+        elif not as_json:
+            template = (
+                f"你是一名专业的出题教授，请根据以下内容生成一个{difficulty_prompt}的{lang_prompt}{question_type_prompt}，"
+                "要求题目专业严谨，不要提供答案，不要已生成的题目考察的内容相似。"
+            )
+        else:
+            template = (
+                f"你是一名专业的出题教授，请根据以下内容生成{count}道{difficulty_prompt}的{lang_prompt}{question_type_prompt}，"
+                "要求题目专业严谨，不要提供答案，各题之间以及与已生成的题目考察的内容不要相似。"
+                f'\n只输出 JSON，不要输出其他内容，格式为：{{"questions": ["题目1", "题目2"]}}，数组长度必须为{count}。'
+            )
+        template += "\n内容：{content}\n已生成题目的覆盖情况：\n{summary}"
+        sections = [("content", self.context), ("summary", self.covered_summary())]
+        prompt_tokens = estimate_tokens(template) + sum(estimate_tokens(text) for _, text in sections)
+        model_name = model_router.route(self.config, "出题", question_type_prompt, prompt_tokens)
+        prompt, _ = fit_prompt(model_name, template, sections)
+        return model_name, prompt
+
+    def request(self, model_name, prompt, validate=None, use_cache=True):
+        """发送一次请求并返回文本结果，优先读取响应缓存
+
+        validate 不为空时，只有通过校验的结果才会写入缓存；
+        use_cache 为 False 时（如重新生成）跳过缓存读取。
+        """
+        key = response_cache.make_key(model_name, PROMPT_VERSION, prompt)
+        if self.config.cache_enabled and use_cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                logging.info(f"任务 {self.task_id} 命中响应缓存")
+                return cached
+
+        # 排队时间只计入任务的第一次调用
+        queue_wait, self.queue_wait = self.queue_wait, None
+        response = llm_caller.create(
+            self.config,
+            model_name,
+            [
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            kind="出题",
+            queue_wait=queue_wait,
+        )
+        usage_tracker.record(
+            model_name, "出题", estimate_tokens(prompt), getattr(response, "usage", None)
+        )
+        content = response.choices[0].message.content.strip()
+        if self.config.cache_enabled and (validate is None or validate(content)):
+            response_cache.put(key, content)
+        return content
+
+    @staticmethod
+    def parse_batch(content, count):
+        """校验并拆分批量结果，返回 [(题目, 标准答案)]，格式不符时返回 None
+
+        每道题可以是字符串，也可以是带 question/answer 字段的对象。
+        """
+        # 模型可能用 ```json 代码块包裹结果，只截取最外层的 JSON 对象
+        text = content.strip()
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            data = json.loads(text[start:end + 1])
+        except ValueError:
+            return None
+
+        questions = data.get("questions") if isinstance(data, dict) else None
+        if not isinstance(questions, list):
+            return None
+        items = []
+        for item in questions:
+            if isinstance(item, dict):
+                question, answer_key = item.get("question"), item.get("answer")
+            else:
+                question, answer_key = item, None
+            if not isinstance(question, str) or not question.strip():
+                continue
+            answer_key = str(answer_key).strip() if answer_key is not None else ""
+            items.append((question.strip(), answer_key or None))
+        questions = items
+        if len(questions) < count:
+            return None
+        return questions[:count]
@@ -0,0 +1,362 @@
+import time
+import random
+import logging
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import httpx
+from PyQt5.QtCore import QMutex
+
+from .client_provider import client_provider
+from .model_router import model_router
+from .telemetry import telemetry, percentile
+
+# modules/llm_caller.py
+
+# 可以重试的 HTTP 状态码：超时、限流和服务端错误
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """断路器打开期间等待超时，未发起请求"""
+
+
+def is_retryable(error):
+    """判断一次调用失败是否为暂时性错误"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # zhipuai 把连接错误和超时包装为 APIConnectionError / APITimeoutError
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def is_timeout(error):
+    return isinstance(error, httpx.TimeoutException) or "Timeout" in type(error).__name__
+
+
+class CircuitBreaker:
+    """模型服务的断路器
+
+    连续 failure_threshold 次暂时性错误后打开，reset_timeout 秒内新请求等待而不是发出；
+    之后进入半开状态，只放行一个试探请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.condition = threading.Condition()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+        self.rejections = 0
+
+    def acquire(self, max_wait):
+        """等待断路器放行，max_wait 秒内仍未放行时抛出 CircuitOpenError"""
+        deadline = time.monotonic() + max_wait
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.state == "closed":
+                    return
+                if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+                    self.state = "half_open"
+                if self.state == "half_open" and not self.probing:
+                    self.probing = True
+                    return
+                if now >= deadline:
+                    self.rejections += 1
+                    raise CircuitOpenError("模型服务暂时不可用，请稍后重试")
+                wake = deadline
+                if self.state == "open":
+                    wake = min(deadline, self.opened_at + self.reset_timeout)
+                self.condition.wait(max(0.01, wake - now))
+
+    def record_success(self):
+        with self.condition:
+            if self.state != "closed":
+                logging.info("模型服务已恢复，断路器关闭")
+            self.state = "closed"
+            self.failures = 0
+            self.probing = False
+            self.condition.notify_all()
+
+    def record_failure(self):
+        with self.condition:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.trips += 1
+                logging.warning(f"模型服务连续失败 {self.failures} 次，断路器打开 {self.reset_timeout:.0f} 秒")
+            self.probing = False
+            self.condition.notify_all()
+
+    def snapshot(self):
+        with self.condition:
+            return {"state": self.state, "trips": self.trips, "rejections": self.rejections}
+
+
+class LLMCaller:
+    """所有模型调用共用的调用层
+
+    每次调用带 config.request_timeout 秒的超时；暂时性错误按带随机抖动的指数退避
+    重试 config.max_retries 次；非流式调用超过该模型近期 p95 延迟仍未返回时，
+    再发出一个相同的对冲请求，取先成功返回的结果（见 send_hedged）。
+    连续失败时断路器暂停发出请求。
+    每次尝试的结果同时记录到 model_router，用于模型选择；每次调用的总耗时、
+    首字延迟、token 用量和排队时间记录到 telemetry。kind 为调用类别，
+    queue_wait 为任务在线程池中等待的秒数。
+    """
+
+    def __init__(self, base_delay=0.5, max_delay=8.0, hedge_min_samples=20, history=200,
+                 max_hedged_calls=16, max_hedges=4):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.history = history
+        self.breaker = CircuitBreaker()
+        # 主请求和对冲请求各用一个线程池，各自的信号量保证提交后立即有线程执行、不会排队
+        self.primary_slots = threading.BoundedSemaphore(max_hedged_calls)
+        self.primary_executor = ThreadPoolExecutor(max_workers=max_hedged_calls, thread_name_prefix="llm-primary")
+        self.hedge_slots = threading.BoundedSemaphore(max_hedges)
+        self.hedge_executor = ThreadPoolExecutor(max_workers=max_hedges, thread_name_prefix="llm-hedge")
+        self.mutex = QMutex()
+        self.latencies = {}
+        self.counters = {}
+
+    def create(self, config, model_name, messages, kind="", queue_wait=None, hedge=True, **kwargs):
+        """非流式调用，返回完整响应"""
+        started = time.monotonic()
+        try:
+            response = self.call_with_retries(
+                config, model_name, lambda: self.send_hedged(config, model_name, messages, hedge, kwargs)
+            )
+        except Exception as e:
+            telemetry.record(
+                model_name, kind, False, time.monotonic() - started,
+                queue_wait=queue_wait, error=type(e).__name__,
+            )
+            raise
+        telemetry.record(
+            model_name, kind, True, time.monotonic() - started,
+            usage=getattr(response, "usage", None), queue_wait=queue_wait,
+        )
+        return response
+
+    def stream(self, config, model_name, messages, kind="", queue_wait=None, **kwargs):
+        """流式调用，逐个产出数据块
+
+        收到第一个数据块之前的失败会重试；已开始输出后出错则直接抛出，避免重复内容。
+        流式调用不对冲。
+        """
+        def attempt():
+            # 客户端一直占用到流读完为止，期间 reset 不会关闭它
+            client = client_provider.acquire(config.api_key)
+            try:
+                response = client.chat.completions.create(
+                    model=model_name, messages=messages, stream=True, timeout=config.request_timeout, **kwargs
+                )
+                chunks = iter(response)
+                return client, next(chunks, None), chunks
+            except Exception:
+                client_provider.release(client)
+                raise
+
+        started = time.monotonic()
+        try:
+            client, first, chunks = self.call_with_retries(config, model_name, attempt, record=False)
+        except Exception as e:
+            telemetry.record(
+                model_name, kind, False, time.monotonic() - started,
+                queue_wait=queue_wait, stream=True, error=type(e).__name__,
+            )
+            raise
+
+        ttft, usage = None, None
+        try:
+            for chunk in itertools.chain([] if first is None else [first], chunks):
+                # 流式响应的用量信息在最后一个数据块中
+                usage = getattr(chunk, "usage", None) or usage
+                if ttft is None and chunk.choices and getattr(chunk.choices[0].delta, "content", None):
+                    ttft = time.monotonic() - started
+                yield chunk
+        except Exception as e:
+            latency = time.monotonic() - started
+            model_router.record(model_name, latency, ok=False)
+            self.count(model_name, "failures")
+            if is_timeout(e):
+                self.count(model_name, "timeouts")
+            telemetry.record(
+                model_name, kind, False, latency, ttft, usage, queue_wait, stream=True, error=type(e).__name__
+            )
+            raise
+        finally:
+            client_provider.release(client)
+        latency = time.monotonic() - started
+        model_router.record(model_name, latency, ok=True)
+        telemetry.record(model_name, kind, True, latency, ttft, usage, queue_wait, stream=True)
+
+    def call_with_retries(self, config, model_name, attempt, record=True):
+        """执行 attempt，暂时性错误时退避重试
+
+        record 为 True 时把成功那次尝试的耗时计入延迟统计（不含退避和断路器等待）；
+        流式调用传 False，由调用方在读完整个流后记录。
+        """
+        self.count(model_name, "calls")
+        retries = max(0, config.max_retries)
+        for retry in range(retries + 1):
+            self.breaker.acquire(config.request_timeout)
+            started = time.monotonic()
+            try:
+                result = attempt()
+            except Exception as e:
+                elapsed = time.monotonic() - started
+                retryable = is_retryable(e)
+                # 非暂时性错误（如参数错误）说明服务可达，不计入断路器
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                model_router.record(model_name, elapsed, ok=False)
+                self.count(model_name, "errors")
+                if is_timeout(e):
+                    self.count(model_name, "timeouts")
+                if not retryable or retry == retries:
+                    self.count(model_name, "failures")
+                    raise
+                delay = self.backoff(retry)
+                self.count(model_name, "retries")
+                logging.warning(f"{model_name} 调用失败（{e}），{delay:.1f} 秒后第 {retry + 1} 次重试")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                if record:
+                    elapsed = time.monotonic() - started
+                    model_router.record(model_name, elapsed, ok=True)
+                    self.record_latency(model_name, elapsed)
+                return result
+
+    def backoff(self, retry):
+        """第 retry 次重试前的等待时间：指数增长，并在 [0, 上限] 内均匀抖动"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def send_hedged(self, config, model_name, messages, hedge, kwargs):
+        """发出请求；超过该模型近期 p95 延迟仍未返回时再发一个对冲请求，取先成功返回的结果
+
+        可对冲的调用把主请求放到 primary_executor 中，调用线程等待 p95 延迟后再把对冲请求
+        放到 hedge_executor 中，两者竞争。两个线程池都由信号量限额，没有空闲线程时
+        不对冲，直接在调用线程上发出请求，因此请求不会在线程池中排队。
+        落后的请求无法中止，会在后台结束，其 token 照常计费且不计入用量统计。
+        """
+        def send():
+            with client_provider.lease(config.api_key) as client:
+                return client.chat.completions.create(
+                    model=model_name, messages=messages, timeout=config.request_timeout, **kwargs
+                )
+
+        delay = self.hedge_delay(model_name) if hedge and config.hedging_enabled else None
+        if delay is None:
+            return send()
+        primary = self.submit(self.primary_executor, self.primary_slots, send)
+        if primary is None:
+            return send()
+
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        hedged = self.submit(self.hedge_executor, self.hedge_slots, send)
+        if hedged is None:
+            return primary.result()
+        self.count(model_name, "hedges")
+        logging.info(f"{model_name} 请求超过 p95 延迟 {delay:.1f} 秒，发出对冲请求")
+
+        pending = {primary, hedged}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedged:
+                        self.count(model_name, "hedge_wins")
+                    return future.result()
+        # 两个请求都失败时抛出主请求的错误
+        return primary.result()
+
+    @staticmethod
+    def submit(executor, slots, send):
+        """有空闲线程时提交 send 并返回 Future，否则返回 None"""
+        if not slots.acquire(blocking=False):
+            return None
+
+        def run():
+            try:
+                return send()
+            finally:
+                slots.release()
+
+        try:
+            return executor.submit(run)
+        except RuntimeError:
+            # 已调用 shutdown
+            slots.release()
+            return None
+
+    def hedge_delay(self, model_name):
+        """该模型近期非流式调用的 p95 延迟，样本不足时返回 None（不对冲）"""
+        self.mutex.lock()
+        try:
+            samples = list(self.latencies.get(model_name, ()))
+        finally:
+            self.mutex.unlock()
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return percentile(samples, 95)
+
+    def record_latency(self, model_name, latency):
+        self.mutex.lock()
+        try:
+            self.latencies.setdefault(model_name, deque(maxlen=self.history)).append(latency)
+        finally:
+            self.mutex.unlock()
+
+    def count(self, model_name, name):
+        self.mutex.lock()
+        try:
+            counters = self.counters.setdefault(model_name, {})
+            counters[name] = counters.get(name, 0) + 1
+        finally:
+            self.mutex.unlock()
+
+    def metrics(self):
+        """各模型的调用次数、失败次数和尾延迟，以及断路器状态"""
+        self.mutex.lock()
+        try:
+            models = {}
+            for model_name in set(self.counters) | set(self.latencies):
+                samples = list(self.latencies.get(model_name, ()))
+                stats = {
+                    name: self.counters.get(model_name, {}).get(name, 0)
+                    for name in ("calls", "errors", "failures", "timeouts", "retries", "hedges", "hedge_wins")
+                }
+                stats.update(
+                    p50=percentile(samples, 50), p95=percentile(samples, 95), p99=percentile(samples, 99)
+                )
+                models[model_name] = stats
+        finally:
+            self.mutex.unlock()
+        return {"models": models, "breaker": self.breaker.snapshot()}
+
+    def shutdown(self):
+        """不再接受新的主请求和对冲请求，已发出的请求在超时内自行结束"""
+        self.primary_executor.shutdown(wait=False, cancel_futures=True)
+        self.hedge_executor.shutdown(wait=False, cancel_futures=True)
+
+
+llm_caller = LLMCaller()
@@ -0,0 +1,136 @@
+import re
+import unicodedata
+from PyQt5.QtCore import QMutex
+
+# modules/local_grader.py
+
+# 可以在本地判分的客观题题型
+OBJECTIVE_TYPES = {"选择题", "判断题", "填空题"}
+
+# 出题时要求模型给出的标准答案格式
+ANSWER_KEY_FORMATS = {
+    "选择题": "只写正确选项的字母，多选题把字母连写，如 \"B\" 或 \"AC\"",
+    "判断题": "只写 \"对\" 或 \"错\"",
+    "填空题": "按空的顺序写出每个空的答案，用 \"；\" 分隔，同一空有多个可接受答案时用 \"|\" 分隔",
+}
+
+TRUE_WORDS = {"对", "正确", "√", "✓", "是", "t", "true", "yes", "y"}
+FALSE_WORDS = {"错", "错误", "×", "✗", "x", "否", "不对", "f", "false", "no", "n"}
+OPTION_PATTERN = re.compile(r"(?<![a-z])[a-h](?![a-z])")
+ANSWER_PREFIX_PATTERN = re.compile(r"^(答案|答|选|选择|我选)\s*[:：是为]?\s*")
+# 标准答案按出题时约定的分隔符拆分，回答还接受逗号、顿号和空白
+KEY_SEPARATORS = re.compile(r"[;；\n]+")
+BLANK_SEPARATORS = re.compile(r"[;；,，、\s]+")
+EDGE_PUNCTUATION = "。.，,、；;：:！!？?\"'“”‘’（）()[]【】 "
+
+
+def normalize_answer(text):
+    """全角转半角、转小写、合并空白，并去掉“答案：”之类的前缀和首尾标点"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = " ".join(text.split())
+    text = ANSWER_PREFIX_PATTERN.sub("", text)
+    return text.strip(EDGE_PUNCTUATION)
+
+
+def option_letters(text):
+    """从答案中取出选项字母集合，如 "答案：B、C" -> {"b", "c"}"""
+    text = normalize_answer(text)
+    if re.fullmatch(r"[a-h]+", text):
+        return set(text)
+    return set(OPTION_PATTERN.findall(text))
+
+
+def truth_value(text):
+    """把判断题答案解析为 True/False，无法识别时返回 None"""
+    text = normalize_answer(text)
+    if text in TRUE_WORDS:
+        return True
+    if text in FALSE_WORDS:
+        return False
+    return None
+
+
+def split_blanks(text, separators=BLANK_SEPARATORS):
+    """拆分填空题各空的答案"""
+    return [blank for blank in (normalize_answer(part) for part in separators.split(text)) if blank]
+
+
+def grade_answer(question_type, answer, answer_key):
+    """在本地为客观题判分，返回 (得分, 是否全对)；无法判分时返回 None
+
+    标准答案或回答无法解析、填空题的空数与标准答案不一致时也返回 None，交给模型评分。
+    """
+    if not answer_key or question_type not in OBJECTIVE_TYPES:
+        return None
+    if question_type == "选择题":
+        expected = option_letters(answer_key)
+        if not expected:
+            return None
+        given = option_letters(answer)
+        if not given:
+            return None
+        correct = given == expected
+        return (100 if correct else 0), correct
+    if question_type == "判断题":
+        expected = truth_value(answer_key)
+        if expected is None:
+            return None
+        given = truth_value(answer)
+        if given is None:
+            return None
+        correct = given == expected
+        return (100 if correct else 0), correct
+
+    expected_blanks = split_blanks(answer_key, KEY_SEPARATORS)
+    if not expected_blanks:
+        return None
+    # 只有一个空时整段回答作为该空的答案，避免回答中的分号被误拆
+    given_blanks = split_blanks(answer) if len(expected_blanks) > 1 else [normalize_answer(answer)]
+    if len(given_blanks) != len(expected_blanks):
+        return None
+    hits = 0
+    for given, expected in zip(given_blanks, expected_blanks):
+        accepted = {normalize_answer(option) for option in expected.split("|")}
+        if given in accepted:
+            hits += 1
+    score = round(hits * 100 / len(expected_blanks))
+    return score, hits == len(expected_blanks)
+
+
+def format_result(score, correct, answer_key):
+    """本地判分结果的反馈文本"""
+    verdict = "回答正确" if correct else "回答错误" if score == 0 else "部分正确"
+    return (
+        f"本地评分：{verdict}，得分 {score} 分。\n"
+        f"标准答案：{answer_key}\n"
+        "如需详细解析，请点击“获取解析”。"
+    )
+
+
+class AnswerKeyStore:
+    """题目的标准答案及出题时的题型，只在本地判分时使用，不在界面上显示
+
+    判分按出题时的题型解析答案，与当前设置中的题型无关。
+    """
+
+    def __init__(self):
+        self.mutex = QMutex()
+        self.keys = {}
+
+    def put(self, question, answer_key, question_type):
+        self.mutex.lock()
+        try:
+            self.keys[question] = (question_type, answer_key)
+        finally:
+            self.mutex.unlock()
+
+    def get(self, question):
+        """返回 (题型, 标准答案)，没有标准答案时返回 None"""
+        self.mutex.lock()
+        try:
+            return self.keys.get(question)
+        finally:
+            self.mutex.unlock()
+
+
+answer_keys = AnswerKeyStore()
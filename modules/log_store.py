@@ -0,0 +1,233 @@
+import os
+import time
+import queue
+import sqlite3
+import threading
+import logging
+from PyQt5.QtCore import QThread
+
+# modules/log_store.py
+
+COLUMNS = ("question", "answer", "feedback", "question_time", "answer_time", "feedback_time")
+HEADERS = ["题目", "答案", "反馈", "生成时间", "回答时间", "反馈时间"]
+
+
+class LogStore:
+    """答题记录存储（SQLite，WAL 模式）
+
+    记录只追加不修改，每次写入的开销只与本批记录数有关，与历史记录总量无关。
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        conn = self.connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "question TEXT, answer TEXT, feedback TEXT, "
+            "question_time TEXT, answer_time TEXT, feedback_time TEXT)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        conn.commit()
+        conn.close()
+
+    def connect(self, durable=False):
+        """创建新连接，每个线程应使用各自的连接
+
+        durable 为 True 时使用 synchronous=FULL，提交返回前 WAL 已刷入磁盘；
+        提交后会截断预写日志的连接必须使用该模式，否则系统崩溃时已确认的记录可能丢失。
+        """
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+        return conn
+
+    def append_batch(self, conn, records, journal_seq=None):
+        """在一个事务中追加一批记录
+
+        journal_seq 为已连续入库的最高预写日志序号（不大于它的记录都已入库），
+        与记录在同一事务中提交，重放日志时据此跳过已入库的记录。
+        """
+        with conn:
+            conn.executemany(
+                f"INSERT INTO records ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [tuple(record[column] for column in COLUMNS) for record in records],
+            )
+            if journal_seq is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('journal_seq', ?)",
+                    (journal_seq,),
+                )
+
+    def journal_seq(self):
+        """返回已连续入库的最高预写日志序号"""
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'journal_seq'").fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def count(self, start_time=None, end_time=None):
+        """返回记录总数，可按生成时间范围筛选"""
+        where, params = self.time_range(start_time, end_time)
+        conn = self.connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM records{where}", params).fetchone()[0]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def time_range(start_time, end_time):
+        """生成按生成时间筛选的 WHERE 子句；时间为 "%Y-%m-%d %H:%M:%S" 字符串，可直接比较"""
+        conditions, params = [], []
+        if start_time:
+            conditions.append("question_time >= ?")
+            params.append(start_time)
+        if end_time:
+            conditions.append("question_time <= ?")
+            params.append(end_time)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, params
+
+    def max_id(self):
+        """返回当前最大的记录编号"""
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM records").fetchone()[0]
+        finally:
+            conn.close()
+
+    def iter_records(self, after_id=0, up_to_id=None):
+        """读取编号在 (after_id, up_to_id] 范围内的记录，每行首列为编号"""
+        conn = self.connect()
+        try:
+            sql = f"SELECT id, {', '.join(COLUMNS)} FROM records WHERE id > ?"
+            params = [after_id]
+            if up_to_id is not None:
+                sql += " AND id <= ?"
+                params.append(up_to_id)
+            for row in conn.execute(sql + " ORDER BY id", params):
+                yield row
+        finally:
+            conn.close()
+
+    def iter_rows(self, start_time=None, end_time=None):
+        """按写入顺序逐行读取记录，可按生成时间范围筛选"""
+        where, params = self.time_range(start_time, end_time)
+        conn = self.connect()
+        try:
+            cursor = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM records{where} ORDER BY id", params
+            )
+            for row in cursor:
+                yield row
+        finally:
+            conn.close()
+
+    def import_excel(self, excel_file):
+        """将旧版 Excel 日志导入数据库（仅在数据库为空时执行）"""
+        if not os.path.exists(excel_file) or self.count() > 0:
+            return 0
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(excel_file, read_only=True)
+        records = []
+        for row in workbook.active.iter_rows(min_row=2, values_only=True):
+            values = list(row[:len(COLUMNS)]) + [None] * (len(COLUMNS) - len(row))
+            records.append(dict(zip(COLUMNS, values)))
+        workbook.close()
+
+        conn = self.connect()
+        try:
+            self.append_batch(conn, records)
+        finally:
+            conn.close()
+        logging.info(f"已从 {excel_file} 导入 {len(records)} 条历史记录")
+        return len(records)
+
+
+class LogWriter(QThread):
+    """后台写入线程，从队列中取出批量记录写入 LogStore
+
+    空闲时每隔 sync_interval 秒对预写日志做一次 fsync，实现组提交。
+    写入失败的记录保留在 failed 中，按指数退避与后续记录合并重试；由于各批按序号
+    顺序提交，且失败的记录总是和后续记录一起写入，已入库的序号始终连续，
+    预写日志的截断点不会越过尚未入库的记录。
+    """
+
+    def __init__(self, store, journal=None, sync_interval=0.2, max_retry_delay=30.0):
+        super().__init__()
+        self.store = store
+        self.journal = journal
+        self.sync_interval = sync_interval
+        self.max_retry_delay = max_retry_delay
+        self.queue = queue.Queue()
+        self.failed = []
+        self.retry_delay = 0.0
+        self.retry_at = 0.0
+
+    def submit(self, entries):
+        """提交一批 (日志序号, 记录)，立即返回"""
+        self.queue.put(list(entries))
+
+    def flush(self, timeout=None):
+        """阻塞到此前提交的记录都已尝试写入；返回 False 表示超时或仍有记录写入失败"""
+        done = threading.Event()
+        self.queue.put(done)
+        if not done.wait(timeout):
+            logging.warning("等待答题记录写入超时")
+            return False
+        return not self.failed
+
+    def stop(self):
+        """写完队列中剩余的记录后结束线程"""
+        self.queue.put(None)
+        self.wait()
+
+    def run(self):
+        conn = self.store.connect(durable=self.journal is not None)
+        try:
+            while True:
+                try:
+                    entries = self.queue.get(timeout=self.sync_interval)
+                except queue.Empty:
+                    entries = []
+                if self.journal is not None:
+                    self.journal.sync()
+                if isinstance(entries, threading.Event):
+                    # flush 标记：之前的记录都已处理，有失败的记录时立即重试一次
+                    if self.failed:
+                        self.write(conn, [])
+                    entries.set()
+                    continue
+                if entries is None:
+                    if self.failed:
+                        # 退出前最后重试一次；仍失败的记录留在预写日志中，下次启动时重放
+                        self.write(conn, [])
+                    break
+                if entries or (self.failed and time.monotonic() >= self.retry_at):
+                    self.write(conn, entries)
+        finally:
+            conn.close()
+
+    def write(self, conn, entries):
+        batch = self.failed + entries
+        last_seq = batch[-1][0]
+        try:
+            self.store.append_batch(conn, [record for _, record in batch], last_seq)
+        except sqlite3.Error as e:
+            self.failed = batch
+            self.retry_delay = min(self.max_retry_delay, max(1.0, self.retry_delay * 2))
+            self.retry_at = time.monotonic() + self.retry_delay
+            logging.error(
+                f"写入答题记录失败，{len(batch)} 条记录将在 {self.retry_delay:.0f} 秒后重试: {e}"
+            )
+            return
+        self.failed = []
+        self.retry_delay = 0.0
+        if self.journal is not None:
+            try:
+                self.journal.checkpoint(last_seq)
+            except OSError as e:
+                logging.error(f"截断预写日志失败: {e}")
@@ -0,0 +1,129 @@
+import time
+import logging
+from PyQt5.QtCore import QMutex
+
+from .token_budget import calibrated_budget
+
+# modules/model_router.py
+
+MODEL_NAMES = ["glm-4-flash", "glm-4-plus", "glm-4-0520", "glm-4-long"]
+
+# 设置中表示“由路由策略决定”的选项
+AUTO_MODEL = "自动"
+
+# 质量相当、可以互相替代的模型
+EQUIVALENT_MODELS = {
+    "glm-4-plus": ["glm-4-plus", "glm-4-0520"],
+    "glm-4-0520": ["glm-4-0520", "glm-4-plus"],
+    "glm-4-flash": ["glm-4-flash"],
+    "glm-4-long": ["glm-4-long"],
+}
+
+# 评分时可以交给速度最快的模型处理的客观题题型
+SIMPLE_GRADING_TYPES = {"判断题", "选择题"}
+
+
+class ModelRouter:
+    """按请求选择模型
+
+    规则依次为：用户为该类请求指定的模型；提示词超过候选模型预算时用 glm-4-long；
+    判断题、选择题的评分用 glm-4-flash；编程题用 glm-4-plus；其余使用设置中的默认模型。
+    选出的模型近期错误率过高或明显慢于同档次模型时，换用同档次中表现更好的模型。
+    被换下的模型不再有请求、统计不会更新，因此统计超过 stats_ttl 秒未更新即作废，
+    请求重新回到首选模型；若它仍然异常，积累 min_samples 次调用后会再次被换下。
+    """
+
+    def __init__(self, alpha=0.2, min_samples=5, max_error_rate=0.5, slow_factor=2.0, stats_ttl=300.0):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.slow_factor = slow_factor
+        self.stats_ttl = stats_ttl
+        self.mutex = QMutex()
+        self.model_stats = {}
+
+    def route(self, config, kind, question_type, prompt_tokens):
+        """为一次请求选择模型，kind 为 "出题" 或 "评分" """
+        override = config.model_overrides.get(kind, AUTO_MODEL)
+        if override != AUTO_MODEL:
+            return override
+        if not config.routing_enabled:
+            return config.model_name
+
+        if kind == "评分" and question_type in SIMPLE_GRADING_TYPES:
+            model_name = "glm-4-flash"
+        elif question_type == "编程题":
+            model_name = "glm-4-plus"
+        else:
+            model_name = config.model_name
+        if prompt_tokens > calibrated_budget(model_name):
+            model_name = "glm-4-long"
+
+        chosen = self.healthiest(model_name)
+        if chosen != model_name:
+            logging.info(f"{kind}请求由 {model_name} 改用 {chosen}（近期延迟或错误率较高）")
+        return chosen
+
+    def healthiest(self, model_name):
+        """在同档次模型中选出近期表现最好的一个"""
+        self.mutex.lock()
+        try:
+            candidates = EQUIVALENT_MODELS.get(model_name, [model_name])
+            self.expire(candidates)
+            healthy = [name for name in candidates if not self.is_failing(name)] or candidates
+            preferred = healthy[0]
+            latencies = {
+                name: self.model_stats[name]["latency"]
+                for name in healthy
+                if self.model_stats.get(name, {}).get("samples", 0) >= self.min_samples
+            }
+            if preferred in latencies:
+                fastest = min(latencies, key=latencies.get)
+                if latencies[preferred] > latencies[fastest] * self.slow_factor:
+                    return fastest
+            return preferred
+        finally:
+            self.mutex.unlock()
+
+    def expire(self, model_names):
+        """丢弃超过 stats_ttl 秒未更新的统计，调用方需持有 mutex"""
+        now = time.monotonic()
+        for name in model_names:
+            stats = self.model_stats.get(name)
+            if stats is not None and now - stats["updated"] > self.stats_ttl:
+                logging.info(f"{name} 的统计已过期，重新尝试该模型")
+                del self.model_stats[name]
+
+    def is_failing(self, model_name):
+        stats = self.model_stats.get(model_name)
+        return (
+            stats is not None
+            and stats["samples"] >= self.min_samples
+            and stats["error_rate"] > self.max_error_rate
+        )
+
+    def record(self, model_name, latency, ok):
+        """记录一次调用的耗时（秒）和结果，用指数滑动平均更新统计"""
+        self.mutex.lock()
+        try:
+            stats = self.model_stats.setdefault(
+                model_name, {"samples": 0, "latency": latency, "error_rate": 0.0}
+            )
+            stats["samples"] += 1
+            stats["updated"] = time.monotonic()
+            if ok:
+                stats["latency"] += self.alpha * (latency - stats["latency"])
+            stats["error_rate"] += self.alpha * ((0.0 if ok else 1.0) - stats["error_rate"])
+        finally:
+            self.mutex.unlock()
+
+    def stats(self):
+        """返回各模型的统计副本"""
+        self.mutex.lock()
+        try:
+            return {name: dict(stats) for name, stats in self.model_stats.items()}
+        finally:
+            self.mutex.unlock()
+
+
+model_router = ModelRouter()
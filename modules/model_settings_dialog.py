@@ -1,6 +1,12 @@
 # modules/model_settings_dialog.py
 
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QComboBox, QPushButton, QHBoxLayout
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QLabel, QLineEdit, QComboBox, QPushButton, QHBoxLayout, QSpinBox, QCheckBox, QMessageBox
+)
+
+from .client_provider import client_provider
+from .response_cache import response_cache
+from .model_router import MODEL_NAMES, AUTO_MODEL
 
 class ModelSettingsDialog(QDialog):
     """模型设置对话框"""
@@ -19,15 +25,84 @@ class ModelSettingsDialog(QDialog):
         self.api_key_edit.setText(self.config.api_key)
         self.api_key_edit.setEchoMode(QLineEdit.Password)
 
-        model_label = QLabel("选择模型:")
+        model_label = QLabel("默认模型:")
         self.model_combo = QComboBox(self)
-        self.model_combo.addItems(["glm-4-flash", "glm-4-plus","glm-4-0520","glm-4-long"])
+        self.model_combo.addItems(MODEL_NAMES)
         self.model_combo.setCurrentText(self.config.model_name)
 
+        self.routing_check = QCheckBox("按题型和资料长度自动选择模型", self)
+        self.routing_check.setChecked(self.config.routing_enabled)
+
+        self.override_combos = {}
+        override_labels = []
+        for kind in ("出题", "评分"):
+            override_labels.append(QLabel(f"{kind}使用的模型:"))
+            combo = QComboBox(self)
+            combo.addItems([AUTO_MODEL] + MODEL_NAMES)
+            combo.setCurrentText(self.config.model_overrides.get(kind, AUTO_MODEL))
+            self.override_combos[kind] = combo
+
+        concurrency_label = QLabel("最大并发请求数:")
+        self.concurrency_spin = QSpinBox(self)
+        self.concurrency_spin.setMinimum(1)
+        self.concurrency_spin.setMaximum(20)
+        self.concurrency_spin.setValue(self.config.max_concurrency)
+
+        batch_label = QLabel("每次请求生成题目数:")
+        self.batch_spin = QSpinBox(self)
+        self.batch_spin.setMinimum(1)
+        self.batch_spin.setMaximum(10)
+        self.batch_spin.setValue(self.config.batch_size)
+
+        prefetch_label = QLabel("后台预取题目数（0 为关闭）:")
+        self.prefetch_spin = QSpinBox(self)
+        self.prefetch_spin.setMinimum(0)
+        self.prefetch_spin.setMaximum(20)
+        self.prefetch_spin.setValue(self.config.prefetch_depth)
+
+        self.cache_check = QCheckBox("启用响应缓存", self)
+        self.cache_check.setChecked(self.config.cache_enabled)
+        clear_cache_button = QPushButton("清空响应缓存", self)
+        clear_cache_button.clicked.connect(self.clear_cache)
+
+        timeout_label = QLabel("单次请求超时（秒）:")
+        self.timeout_spin = QSpinBox(self)
+        self.timeout_spin.setMinimum(5)
+        self.timeout_spin.setMaximum(600)
+        self.timeout_spin.setValue(self.config.request_timeout)
+
+        retries_label = QLabel("失败重试次数:")
+        self.retries_spin = QSpinBox(self)
+        self.retries_spin.setMinimum(0)
+        self.retries_spin.setMaximum(10)
+        self.retries_spin.setValue(self.config.max_retries)
+
+        self.hedging_check = QCheckBox("请求较慢时发出对冲请求（会增加 token 用量）", self)
+        self.hedging_check.setChecked(self.config.hedging_enabled)
+
         layout.addWidget(api_key_label)
         layout.addWidget(self.api_key_edit)
         layout.addWidget(model_label)
         layout.addWidget(self.model_combo)
+        layout.addWidget(self.routing_check)
+        for label, combo in zip(override_labels, self.override_combos.values()):
+            layout.addWidget(label)
+            layout.addWidget(combo)
+        layout.addWidget(concurrency_label)
+        layout.addWidget(self.concurrency_spin)
+        layout.addWidget(batch_label)
+        layout.addWidget(self.batch_spin)
+        layout.addWidget(prefetch_label)
+        layout.addWidget(self.prefetch_spin)
+        cache_layout = QHBoxLayout()
+        cache_layout.addWidget(self.cache_check)
+        cache_layout.addWidget(clear_cache_button)
+        layout.addLayout(cache_layout)
+        layout.addWidget(timeout_label)
+        layout.addWidget(self.timeout_spin)
+        layout.addWidget(retries_label)
+        layout.addWidget(self.retries_spin)
+        layout.addWidget(self.hedging_check)
 
         button_layout = QHBoxLayout()
         save_button = QPushButton("保存", self)
@@ -41,8 +116,26 @@ class ModelSettingsDialog(QDialog):
         layout.addLayout(button_layout)
         self.setLayout(layout)
 
+    def clear_cache(self):
+        response_cache.clear()
+        QMessageBox.information(self, "提示", "响应缓存已清空。")
+
     def save_settings(self):
-        self.config.api_key = self.api_key_edit.text().strip()
+        api_key = self.api_key_edit.text().strip()
+        if api_key != self.config.api_key:
+            client_provider.reset()
+        self.config.api_key = api_key
         self.config.model_name = self.model_combo.currentText()
+        self.config.routing_enabled = self.routing_check.isChecked()
+        self.config.model_overrides = {
+            kind: combo.currentText() for kind, combo in self.override_combos.items()
+        }
+        self.config.max_concurrency = self.concurrency_spin.value()
+        self.config.batch_size = self.batch_spin.value()
+        self.config.prefetch_depth = self.prefetch_spin.value()
+        self.config.cache_enabled = self.cache_check.isChecked()
+        self.config.request_timeout = self.timeout_spin.value()
+        self.config.max_retries = self.retries_spin.value()
+        self.config.hedging_enabled = self.hedging_check.isChecked()
         self.config.save_user_config()
         self.accept()
@@ -0,0 +1,95 @@
+import re
+import random
+from collections import deque
+from PyQt5.QtCore import QMutex
+
+# modules/question_dedup.py
+
+MERSENNE_PRIME = (1 << 61) - 1
+PUNCTUATION_PATTERN = re.compile(r"[\W_]+")
+
+
+class QuestionDeduplicator:
+    """本地近重复题目检测
+
+    每道题目按字符 n-gram 切成 shingle 集合，用 MinHash + LSH 分桶快速找出候选，
+    再以 Jaccard 相似度确认。提示词中只放入最近若干道题目的题干摘要，
+    而不是全部历史题目，长度不随题目数量增长。
+    """
+
+    def __init__(self, threshold=0.6, shingle_size=3, num_perm=64, bands=16, seed=1,
+                 summary_size=10, stem_chars=30):
+        self.threshold = threshold
+        self.summary_size = summary_size
+        self.stem_chars = stem_chars
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self.mutex = QMutex()
+        self.reset()
+
+    def reset(self):
+        """清空已记录的题目（更换资料时调用）"""
+        self.shingle_sets = []
+        self.buckets = {}
+        self.recent_stems = deque(maxlen=self.summary_size)
+        self.rejected = 0
+
+    def shingles(self, question):
+        text = PUNCTUATION_PATTERN.sub("", question.lower())
+        if len(text) <= self.shingle_size:
+            return {text}
+        return {text[i:i + self.shingle_size] for i in range(len(text) - self.shingle_size + 1)}
+
+    def signature(self, shingles):
+        hashes = [hash(shingle) & MERSENNE_PRIME for shingle in shingles]
+        return [min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.permutations]
+
+    def band_keys(self, signature):
+        return [
+            (band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def try_add(self, question):
+        """题目与已有题目不近似时记录并返回 True，否则返回 False"""
+        shingles = self.shingles(question)
+        keys = self.band_keys(self.signature(shingles))
+
+        self.mutex.lock()
+        try:
+            candidates = set()
+            for key in keys:
+                candidates.update(self.buckets.get(key, ()))
+            for candidate in candidates:
+                existing = self.shingle_sets[candidate]
+                similarity = len(shingles & existing) / len(shingles | existing)
+                if similarity >= self.threshold:
+                    self.rejected += 1
+                    return False
+
+            question_id = len(self.shingle_sets)
+            self.shingle_sets.append(shingles)
+            for key in keys:
+                self.buckets.setdefault(key, []).append(question_id)
+            stem = " ".join(question.split())[:self.stem_chars]
+            self.recent_stems.append(stem)
+            return True
+        finally:
+            self.mutex.unlock()
+
+    def summary(self):
+        """已覆盖内容的摘要：题目总数加最近几道题的题干开头"""
+        self.mutex.lock()
+        try:
+            if not self.shingle_sets:
+                return "无"
+            stems = "\n".join(f"- {stem}" for stem in self.recent_stems)
+            return f"已生成 {len(self.shingle_sets)} 道题，最近的题目：\n{stems}"
+        finally:
+            self.mutex.unlock()
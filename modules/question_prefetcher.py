@@ -0,0 +1,135 @@
+import logging
+from collections import deque
+from PyQt5.QtCore import QObject, QThreadPool
+
+from .worker_signals import WorkerSignals
+from .generate_question_task import GenerateQuestionTask
+
+# modules/question_prefetcher.py
+
+class QuestionPrefetcher(QObject):
+    """后台预取题目
+
+    在用户答题时于后台保持 config.prefetch_depth 道已生成的题目，
+    “下一题”和新一轮出题可以直接从缓冲区取题。同一时间最多只有一个预取请求，
+    评分请求进行中时暂停发起新的预取，避免与评分争抢接口配额。
+    资料或出题设置变化时清空缓冲区，并丢弃仍在进行的预取结果。
+    """
+
+    def __init__(self, config, document_index=None, deduplicator=None, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self.document_index = document_index
+        self.deduplicator = deduplicator
+        # 预取使用独立的单线程池，不占用用户操作所用的全局线程池
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.signals = WorkerSignals()
+        self.buffer = deque()
+        self.active_tasks = {}
+        self.cancelled_tasks = {}
+        self.next_task_id = 0
+        self.paused = False
+        self.key = self.settings_key()
+
+    def settings_key(self):
+        """影响题目内容的设置，任何一项变化都会使已预取的题目失效"""
+        return (
+            self.config.language,
+            self.config.difficulty,
+            self.config.question_type,
+            self.config.model_name,
+            self.config.routing_enabled,
+            tuple(sorted(self.config.model_overrides.items())),
+        )
+
+    def refresh(self):
+        """设置变化时清空缓冲区，然后补充预取"""
+        if self.settings_key() != self.key:
+            self.invalidate()
+        self.fill()
+
+    def available(self):
+        """缓冲区中可直接使用的题目数"""
+        if self.settings_key() != self.key:
+            self.invalidate()
+        return len(self.buffer)
+
+    def take(self, count):
+        """从缓冲区取出至多 count 道题目，由调用方决定何时调用 fill() 补充"""
+        questions = []
+        while self.available() and len(questions) < count:
+            questions.append(self.buffer.popleft())
+        return questions
+
+    def set_paused(self, paused):
+        """暂停或恢复发起新的预取请求（进行中的请求不受影响）"""
+        self.paused = paused
+        if not paused:
+            self.fill()
+
+    def fill(self):
+        """缓冲区不足时发起一个预取任务"""
+        depth = self.config.prefetch_depth
+        if self.paused or depth <= 0 or self.active_tasks:
+            return
+        if not self.config.file_content and (self.document_index is None or self.document_index.is_empty()):
+            return
+        if self.settings_key() != self.key:
+            self.invalidate()
+        missing = depth - len(self.buffer)
+        if missing <= 0:
+            return
+
+        count = min(missing, max(1, self.config.batch_size))
+        task_id = self.next_task_id
+        self.next_task_id += 1
+        task = GenerateQuestionTask(
+            self.config, self.deduplicator, task_id, count, self.document_index
+        )
+        task.setAutoDelete(False)
+        task.signals.result.connect(
+            lambda question, task_id=task_id: self.on_task_result(task_id, question)
+        )
+        task.signals.error.connect(
+            lambda message, task_id=task_id: self.on_task_error(task_id, message)
+        )
+        task.signals.complete.connect(
+            lambda task_id=task_id: self.on_task_complete(task_id)
+        )
+        self.active_tasks[task_id] = task
+        logging.info(f"后台预取 {count} 道题目（缓冲区现有 {len(self.buffer)} 道）")
+        self.pool.start(task)
+
+    def on_task_result(self, task_id, question):
+        """预取结果放入缓冲区，已失效的任务结果直接丢弃"""
+        if task_id in self.active_tasks:
+            self.buffer.append(question)
+            self.signals.progress.emit(len(self.buffer))
+
+    def on_task_error(self, task_id, message):
+        """预取失败只记录日志，不打扰用户"""
+        if task_id in self.active_tasks:
+            logging.warning(f"预取题目失败: {message}")
+
+    def on_task_complete(self, task_id):
+        self.cancelled_tasks.pop(task_id, None)
+        if self.active_tasks.pop(task_id, None) is not None:
+            self.fill()
+
+    def invalidate(self):
+        """清空缓冲区并取消预取任务（资料或设置变化时调用）"""
+        if self.buffer or self.active_tasks:
+            logging.info(f"资料或设置已变化，丢弃 {len(self.buffer)} 道预取题目")
+        self.buffer.clear()
+        for task_id, task in self.active_tasks.items():
+            if not self.pool.tryTake(task):
+                # 已在运行，保留引用直到其结束
+                self.cancelled_tasks[task_id] = task
+        self.active_tasks.clear()
+        self.key = self.settings_key()
+
+    def shutdown(self):
+        """取消预取并等待运行中的任务结束"""
+        self.invalidate()
+        self.pool.waitForDone()
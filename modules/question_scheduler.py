@@ -0,0 +1,103 @@
+import logging
+from PyQt5.QtCore import QObject, QThreadPool
+
+from .worker_signals import WorkerSignals
+from .generate_question_task import GenerateQuestionTask
+
+# modules/question_scheduler.py
+
+class QuestionScheduler(QObject):
+    """题目生成调度器
+
+    使用固定大小的线程池执行 GenerateQuestionTask，超出并发上限的任务在池内排队，
+    避免一次性启动大量线程并同时请求接口而触发限流。题目按 config.batch_size
+    分组，每个任务一次请求生成一组题目。
+    """
+
+    def __init__(self, config, document_index=None, deduplicator=None, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self.document_index = document_index
+        self.deduplicator = deduplicator
+        self.pool = QThreadPool(self)
+        self.signals = WorkerSignals()
+        self.active_tasks = {}
+        self.cancelled_tasks = {}
+        self.total = 0
+        self.finished = 0
+        self.next_task_id = 0
+
+    def start(self, num_questions):
+        """将 num_questions 道题目按批次拆分为生成任务并加入队列"""
+        self.pool.setMaxThreadCount(max(1, self.config.max_concurrency))
+        if not self.active_tasks:
+            self.total = 0
+            self.finished = 0
+        self.total += num_questions
+
+        batch_size = max(1, self.config.batch_size)
+        logging.info(
+            f"调度 {num_questions} 道题目，每批 {batch_size} 道，并发上限 {self.pool.maxThreadCount()}"
+        )
+        remaining = num_questions
+        while remaining > 0:
+            count = min(batch_size, remaining)
+            remaining -= count
+            task_id = self.next_task_id
+            self.next_task_id += 1
+            task = GenerateQuestionTask(
+                self.config, self.deduplicator, task_id, count, self.document_index
+            )
+            task.setAutoDelete(False)
+            task.signals.result.connect(
+                lambda question, task_id=task_id: self.on_task_result(task_id, question)
+            )
+            task.signals.error.connect(
+                lambda message, task_id=task_id: self.on_task_error(task_id, message)
+            )
+            task.signals.complete.connect(
+                lambda task_id=task_id: self.on_task_complete(task_id)
+            )
+            self.active_tasks[task_id] = task
+            self.pool.start(task)
+
+    def on_task_result(self, task_id, question):
+        """转发任务结果，已取消的任务结果直接丢弃"""
+        if task_id in self.active_tasks:
+            self.signals.result.emit(question)
+
+    def on_task_error(self, task_id, message):
+        """转发任务错误"""
+        if task_id in self.active_tasks:
+            self.signals.error.emit(message)
+
+    def on_task_complete(self, task_id):
+        """单个任务完成后按其题目数更新进度，全部完成时发出 complete 信号"""
+        self.cancelled_tasks.pop(task_id, None)
+        task = self.active_tasks.pop(task_id, None)
+        if task is None:
+            return
+        self.finished += task.batch_size
+        self.signals.progress.emit(self.finished)
+        if not self.active_tasks:
+            logging.info(f"题目生成队列已完成，共 {self.finished} 道题目")
+            self.signals.complete.emit()
+
+    def is_running(self):
+        """是否仍有排队或运行中的任务"""
+        return bool(self.active_tasks)
+
+    def cancel(self):
+        """取消所有任务：排队中的直接移出线程池，运行中的任务结果将被丢弃"""
+        for task_id, task in self.active_tasks.items():
+            if not self.pool.tryTake(task):
+                # 已在运行，保留引用直到其结束
+                self.cancelled_tasks[task_id] = task
+        self.active_tasks.clear()
+        self.total = 0
+        self.finished = 0
+
+    def shutdown(self):
+        """取消排队任务并等待运行中的任务结束"""
+        self.cancel()
+        self.pool.waitForDone()
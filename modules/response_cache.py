@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from PyQt5.QtCore import QMutex
+
+# modules/response_cache.py
+
+class ResponseCache:
+    """模型响应的本地持久化缓存
+
+    以 (模型, 提示词模板版本, 输入内容) 的哈希为键，将响应文本保存在 SQLite 中。
+    超过容量或有效期时按最近最少使用（LRU）顺序淘汰。
+    """
+
+    def __init__(self, db_file="llm_cache.sqlite3", max_bytes=50 * 1024 * 1024,
+                 max_age=30 * 24 * 3600):
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.mutex = QMutex()
+        self.conn = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model, version, *inputs):
+        """根据模型、模板版本和输入内容生成缓存键"""
+        payload = json.dumps([model, version, *inputs], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """读取缓存，未命中或已过期时返回 None"""
+        self.mutex.lock()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.max_age:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+        except sqlite3.Error as e:
+            logging.error(f"读取响应缓存失败: {e}")
+            self.misses += 1
+            return None
+        finally:
+            self.mutex.unlock()
+
+    def put(self, key, value):
+        """写入缓存并按容量和有效期淘汰旧条目"""
+        self.mutex.lock()
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"写入响应缓存失败: {e}")
+        finally:
+            self.mutex.unlock()
+
+    def clear(self):
+        """清空缓存"""
+        self.mutex.lock()
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"清空响应缓存失败: {e}")
+        finally:
+            self.mutex.unlock()
+
+    def stats(self):
+        """返回命中统计"""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logging.info(f"响应缓存淘汰 {len(evicted)} 条记录")
+
+    def _connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)"
+            )
+            self.conn.commit()
+        return self.conn
+
+
+response_cache = ResponseCache()
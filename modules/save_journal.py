@@ -0,0 +1,152 @@
+import os
+import json
+import logging
+from PyQt5.QtCore import QMutex
+
+# modules/save_journal.py
+
+class SaveJournal:
+    """保存队列的预写日志
+
+    每条记录在进入内存队列前先追加到日志文件（JSON Lines），fsync 由后台写入线程
+    批量执行（组提交）。记录写入数据库后再截断日志；启动时重放尚未入库的记录。
+    """
+
+    def __init__(self, journal_file):
+        self.journal_file = journal_file
+        self.mutex = QMutex()
+        self.next_seq = 1
+        self.dirty = False
+        self.file = None
+
+    def replay(self, committed_seq):
+        """读取日志中序号大于 committed_seq 的记录，返回 (seq, record) 列表"""
+        entries = []
+        max_seq = committed_seq
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 崩溃时可能留下写了一半的最后一行
+                        logging.warning("跳过日志中不完整的记录")
+                        continue
+                    max_seq = max(max_seq, entry["seq"])
+                    if entry["seq"] > committed_seq:
+                        entries.append((entry["seq"], entry["record"]))
+        self.next_seq = max_seq + 1
+        return entries
+
+    def open(self):
+        """打开日志文件用于追加"""
+        self.truncate_torn_line()
+        self.file = open(self.journal_file, "a", encoding="utf-8")
+
+    def reopen(self):
+        """重新打开日志文件，失败时记录错误并返回 None，下次追加时再试"""
+        try:
+            self.truncate_torn_line()
+            return open(self.journal_file, "a", encoding="utf-8")
+        except OSError as e:
+            logging.error(f"打开预写日志失败，新记录暂时只保存在内存队列中: {e}")
+            return None
+
+    def truncate_torn_line(self, block_size=4096):
+        """崩溃或写入失败可能留下没有换行结尾的半行，截断到最后一个换行符之后
+
+        否则新记录会接在半行后面，两者都无法解析。
+        """
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            position = end
+            keep = 0
+            while position > 0:
+                start = max(0, position - block_size)
+                f.seek(start)
+                index = f.read(position - start).rfind(b"\n")
+                if index >= 0:
+                    keep = start + index + 1
+                    break
+                position = start
+            f.truncate(keep)
+            logging.warning(f"预写日志末尾有不完整的记录，已截断 {end - keep} 字节")
+
+    def append(self, record):
+        """追加一条记录并返回其序号；写入操作系统缓冲区，fsync 由 sync 批量完成
+
+        日志文件无法打开或写入时只记录错误，记录仍会进入保存队列，但异常退出时无法恢复。
+        """
+        self.mutex.lock()
+        try:
+            seq = self.next_seq
+            self.next_seq += 1
+            if self.file is None:
+                self.file = self.reopen()
+            if self.file is not None:
+                try:
+                    self.file.write(json.dumps({"seq": seq, "record": record}, ensure_ascii=False) + "\n")
+                    self.file.flush()
+                    self.dirty = True
+                except OSError as e:
+                    logging.error(f"写入预写日志失败: {e}")
+            return seq
+        finally:
+            self.mutex.unlock()
+
+    def sync(self):
+        """将自上次 sync 以来的所有追加一次性刷入磁盘"""
+        self.mutex.lock()
+        try:
+            if self.dirty and self.file is not None:
+                os.fsync(self.file.fileno())
+                self.dirty = False
+        finally:
+            self.mutex.unlock()
+
+    def checkpoint(self, committed_seq):
+        """删除已入库的记录；通过临时文件加原子重命名重写日志
+
+        committed_seq 对应的提交必须已持久化（见 LogStore.connect 的 durable）。
+        重写失败时保留原日志；无论成败都会重新打开日志文件，打开失败时由 append 重试。
+        """
+        self.mutex.lock()
+        try:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            try:
+                remaining = []
+                with open(self.journal_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            if json.loads(line)["seq"] > committed_seq:
+                                remaining.append(line)
+                        except ValueError:
+                            continue
+                temp_file = self.journal_file + ".tmp"
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    f.writelines(remaining)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.journal_file)
+                # 保留下来的记录已随临时文件刷入磁盘
+                self.dirty = False
+            finally:
+                self.file = self.reopen()
+        finally:
+            self.mutex.unlock()
+
+    def close(self):
+        """关闭日志文件"""
+        self.sync()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
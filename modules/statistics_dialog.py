@@ -1,12 +1,25 @@
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel
+import logging
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QPushButton, QFileDialog, QMessageBox
+)
 from PyQt5.QtGui import QFont
 
+from .telemetry import telemetry
+from .llm_caller import llm_caller
+from .client_provider import client_provider
+from .response_cache import response_cache
+
+
+def format_seconds(value):
+    return "-" if value is None else f"{value:.2f} 秒"
+
 class StatisticsDialog(QDialog):
-    """显示用户答题统计信息的对话框"""
+    """显示用户答题统计信息和各模型调用性能的对话框"""
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("统计信息")
+        self.resize(900, 500)
         self.init_ui()
 
     def init_ui(self):
@@ -31,4 +44,65 @@ class StatisticsDialog(QDialog):
         layout.addWidget(correct_label)
         layout.addWidget(accuracy_label)
 
+        layout.addWidget(QLabel("模型调用性能（最近的调用记录）："))
+        layout.addWidget(self.create_model_table())
+
+        metrics = llm_caller.metrics()
+        breaker = metrics["breaker"]
+        retries = sum(stats["retries"] for stats in metrics["models"].values())
+        hedges = sum(stats["hedges"] for stats in metrics["models"].values())
+        hedge_wins = sum(stats["hedge_wins"] for stats in metrics["models"].values())
+        layout.addWidget(QLabel(
+            f"本次运行：重试 {retries} 次，对冲请求 {hedges} 次（其中 {hedge_wins} 次先返回），"
+            f"断路器状态 {breaker['state']}，打开过 {breaker['trips']} 次"
+        ))
+        connections = client_provider.stats()
+        layout.addWidget(QLabel(
+            f"HTTP 请求 {connections['requests_sent']} 次，新建连接 {connections['connections_opened']} 个，"
+            f"复用连接 {connections['connections_reused']} 次"
+        ))
+        cache = response_cache.stats()
+        layout.addWidget(QLabel(f"响应缓存：命中 {cache['hits']} 次，未命中 {cache['misses']} 次"))
+
+        export_button = QPushButton("导出 Prometheus 指标", self)
+        export_button.clicked.connect(self.export_metrics)
+        layout.addWidget(export_button)
+
         self.setLayout(layout)
+
+    def create_model_table(self):
+        summary = telemetry.summary()
+        headers = ["模型", "调用次数", "错误率", "p50 延迟", "p95 延迟", "p99 延迟", "首字延迟 p50", "首字延迟 p95", "tokens/秒", "排队 p50"]
+        table = QTableWidget(len(summary), len(headers), self)
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for row, (model, stats) in enumerate(summary.items()):
+            tokens_per_second = stats["tokens_per_second"]
+            values = [
+                model,
+                str(stats["calls"]),
+                f"{stats['error_rate'] * 100:.1f}%",
+                format_seconds(stats["p50"]),
+                format_seconds(stats["p95"]),
+                format_seconds(stats["p99"]),
+                format_seconds(stats["ttft_p50"]),
+                format_seconds(stats["ttft_p95"]),
+                "-" if tokens_per_second is None else f"{tokens_per_second:.1f}",
+                format_seconds(stats["queue_wait_p50"]),
+            ]
+            for column, value in enumerate(values):
+                table.setItem(row, column, QTableWidgetItem(value))
+        table.resizeColumnsToContents()
+        return table
+
+    def export_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出指标", "exam_metrics.prom", "Prometheus 文本 (*.prom *.txt)")
+        if not path:
+            return
+        try:
+            telemetry.export_prometheus(path)
+        except OSError as e:
+            logging.error(f"导出指标失败: {e}")
+            QMessageBox.warning(self, "错误", f"导出指标失败：{e}")
+            return
+        QMessageBox.information(self, "导出成功", f"指标已导出到 {path}")
@@ -0,0 +1,219 @@
+import os
+import json
+import math
+import time
+import logging
+from collections import deque
+from PyQt5.QtCore import QMutex
+
+# modules/telemetry.py
+
+
+def percentile(values, q):
+    """取 values 的第 q 百分位数（最近秩法），values 为空时返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def usage_tokens(usage):
+    """从响应的 usage 中取出 (提示 token 数, 生成 token 数)，没有用量信息时为 None"""
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Telemetry:
+    """每次模型调用的耗时和用量记录
+
+    记录保存在容量为 capacity 的环形缓冲区中，用于统计分位数；同时追加写入
+    metrics_file（每行一条 JSON），启动时从文件末尾恢复最近的记录。
+    写文件由 flush() 完成，与保存队列一样由主窗口的定时器触发；文件超过
+    max_file_bytes 时只保留缓冲区中的记录。累计计数不受缓冲区容量限制，用于 Prometheus 导出。
+    """
+
+    def __init__(self, metrics_file="model_metrics.jsonl", capacity=2000, max_file_bytes=5 * 1024 * 1024):
+        self.metrics_file = metrics_file
+        self.max_file_bytes = max_file_bytes
+        self.records = deque(maxlen=capacity)
+        self.pending = []
+        self.totals = {}
+        self.mutex = QMutex()
+        self.load()
+
+    def load(self):
+        """从指标文件末尾读取最近的记录"""
+        if not os.path.exists(self.metrics_file):
+            return
+        try:
+            with open(self.metrics_file, "r", encoding="utf-8") as f:
+                lines = deque(f, maxlen=self.records.maxlen)
+        except OSError as e:
+            logging.error(f"读取模型调用指标失败: {e}")
+            return
+        for line in lines:
+            try:
+                self.records.append(json.loads(line))
+            except ValueError:
+                continue
+
+    def record(self, model, kind, ok, latency, ttft=None, usage=None, queue_wait=None, stream=False, error=None):
+        """记录一次模型调用（包含重试在内），耗时单位为秒"""
+        prompt_tokens, completion_tokens = usage_tokens(usage)
+        entry = {
+            "time": time.time(),
+            "model": model,
+            "kind": kind,
+            "ok": ok,
+            "stream": stream,
+            "latency": round(latency, 4),
+            "ttft": None if ttft is None else round(ttft, 4),
+            "queue_wait": None if queue_wait is None else round(queue_wait, 4),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "error": error,
+        }
+        self.mutex.lock()
+        try:
+            self.records.append(entry)
+            self.pending.append(entry)
+            totals = self.totals.setdefault(
+                (model, kind),
+                {"ok": 0, "error": 0, "latency_sum": 0.0, "prompt_tokens": 0, "completion_tokens": 0},
+            )
+            totals["ok" if ok else "error"] += 1
+            totals["latency_sum"] += latency
+            totals["prompt_tokens"] += prompt_tokens or 0
+            totals["completion_tokens"] += completion_tokens or 0
+        finally:
+            self.mutex.unlock()
+
+        ttft_text = f"，首字 {ttft:.2f} 秒" if ttft is not None else ""
+        tokens_text = f"，生成 {completion_tokens} tokens" if completion_tokens is not None else ""
+        logging.info(f"{model} {kind}调用{'完成' if ok else '失败'}，耗时 {latency:.2f} 秒{ttft_text}{tokens_text}")
+
+    def flush(self):
+        """把新记录追加写入指标文件"""
+        self.mutex.lock()
+        try:
+            entries, self.pending = self.pending, []
+        finally:
+            self.mutex.unlock()
+        if not entries:
+            return
+        try:
+            with open(self.metrics_file, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            if os.path.getsize(self.metrics_file) > self.max_file_bytes:
+                with open(self.metrics_file, "w", encoding="utf-8") as f:
+                    for entry in self.snapshot():
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logging.error(f"写入模型调用指标失败: {e}")
+
+    def snapshot(self):
+        self.mutex.lock()
+        try:
+            return list(self.records)
+        finally:
+            self.mutex.unlock()
+
+    def summary(self):
+        """按模型汇总缓冲区中的记录
+
+        tokens_per_second 为生成 token 数除以生成耗时（流式调用扣除首字延迟）。
+        """
+        by_model = {}
+        for entry in self.snapshot():
+            by_model.setdefault(entry["model"], []).append(entry)
+
+        result = {}
+        for model, entries in sorted(by_model.items()):
+            latencies = [entry["latency"] for entry in entries if entry["ok"]]
+            ttfts = [entry["ttft"] for entry in entries if entry["ttft"] is not None]
+            waits = [entry["queue_wait"] for entry in entries if entry["queue_wait"] is not None]
+            generated = [
+                (entry["completion_tokens"], entry["latency"] - (entry["ttft"] or 0))
+                for entry in entries
+                if entry["ok"] and entry["completion_tokens"]
+            ]
+            generation_time = sum(seconds for _, seconds in generated)
+            errors = sum(1 for entry in entries if not entry["ok"])
+            result[model] = {
+                "calls": len(entries),
+                "error_rate": errors / len(entries),
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "ttft_p50": percentile(ttfts, 50),
+                "ttft_p95": percentile(ttfts, 95),
+                "tokens_per_second": (
+                    sum(tokens for tokens, _ in generated) / generation_time if generation_time > 0 else None
+                ),
+                "queue_wait_p50": percentile(waits, 50),
+            }
+        return result
+
+    def prometheus_text(self):
+        """以 Prometheus 文本格式导出指标
+
+        计数器为本次运行的累计值；分位数按缓冲区中的最近记录计算。
+        """
+        self.mutex.lock()
+        try:
+            totals = {key: dict(value) for key, value in self.totals.items()}
+        finally:
+            self.mutex.unlock()
+        entries = self.snapshot()
+
+        lines = [
+            "# HELP exam_llm_requests_total Model calls by status.",
+            "# TYPE exam_llm_requests_total counter",
+        ]
+        for (model, kind), value in sorted(totals.items()):
+            for status in ("ok", "error"):
+                lines.append(
+                    f'exam_llm_requests_total{{model="{escape_label(model)}",kind="{escape_label(kind)}",status="{status}"}} {value[status]}'
+                )
+        lines += [
+            "# HELP exam_llm_tokens_total Tokens reported by the model API.",
+            "# TYPE exam_llm_tokens_total counter",
+        ]
+        for (model, kind), value in sorted(totals.items()):
+            for token_type in ("prompt", "completion"):
+                lines.append(
+                    f'exam_llm_tokens_total{{model="{escape_label(model)}",kind="{escape_label(kind)}",type="{token_type}"}} {value[token_type + "_tokens"]}'
+                )
+
+        summaries = [
+            ("exam_llm_request_duration_seconds", "End-to-end model call latency, including retries.", "latency"),
+            ("exam_llm_time_to_first_token_seconds", "Time to first streamed token.", "ttft"),
+            ("exam_llm_queue_wait_seconds", "Time a task waited in the thread pool before calling the model.", "queue_wait"),
+        ]
+        for name, help_text, field in summaries:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+            by_model = {}
+            for entry in entries:
+                if entry[field] is not None and (field != "latency" or entry["ok"]):
+                    by_model.setdefault(entry["model"], []).append(entry[field])
+            for model, values in sorted(by_model.items()):
+                label = f'model="{escape_label(model)}"'
+                for quantile in (0.5, 0.95, 0.99):
+                    lines.append(f'{name}{{{label},quantile="{quantile}"}} {percentile(values, quantile * 100)}')
+                lines.append(f"{name}_sum{{{label}}} {sum(values)}")
+                lines.append(f"{name}_count{{{label}}} {len(values)}")
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+
+telemetry = Telemetry()
@@ -0,0 +1,138 @@
+import re
+import logging
+from collections import deque
+from PyQt5.QtCore import QMutex
+
+# modules/token_budget.py
+
+# 各模型的上下文长度（与帮助文档中的表格一致）
+MODEL_CONTEXT_TOKENS = {
+    "glm-4-plus": 128000,
+    "glm-4-0520": 128000,
+    "glm-4-long": 1000000,
+    "glm-4-flash": 128000,
+}
+
+# 各模型的提示词预算：低于上下文上限，避免超长请求拖慢响应
+MODEL_PROMPT_BUDGETS = {
+    "glm-4-plus": 32000,
+    "glm-4-0520": 32000,
+    "glm-4-long": 200000,
+    "glm-4-flash": 16000,
+}
+
+MAX_OUTPUT_TOKENS = 4096
+DEFAULT_PROMPT_BUDGET = 16000
+CJK_PATTERN = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text):
+    """粗略估计文本的 token 数：中文字符按 1 个计，其余字符按 3 个字符 1 个计（偏保守）"""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 2) // 3
+
+
+def prompt_budget(model_name):
+    """返回模型的提示词 token 预算，同时保证为输出留出空间"""
+    budget = MODEL_PROMPT_BUDGETS.get(model_name, DEFAULT_PROMPT_BUDGET)
+    context = MODEL_CONTEXT_TOKENS.get(model_name, DEFAULT_PROMPT_BUDGET + MAX_OUTPUT_TOKENS)
+    return min(budget, context - MAX_OUTPUT_TOKENS)
+
+
+def calibrated_budget(model_name):
+    """以 estimate_tokens 的估计值计的提示词预算
+
+    按该模型近期实际与估计 token 数之比校准，估算偏低时预算相应收紧，偏高时放宽，
+    使实际用量接近 prompt_budget；比值限制在 0.5 到 2 之间。
+    """
+    budget = prompt_budget(model_name)
+    ratio = usage_tracker.estimate_ratio(model_name)
+    if ratio is None:
+        return budget
+    return int(budget / min(2.0, max(0.5, ratio)))
+
+
+def truncate_middle(text, max_chars):
+    """保留开头和结尾，截掉中间部分"""
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 20:
+        return text[:max_chars]
+    head = max_chars * 2 // 3
+    tail = max_chars - head - 5
+    return text[:head] + "\n……\n" + text[-tail:]
+
+
+def fit_prompt(model_name, template, sections):
+    """把各段内容填入模板，超出预算时按顺序压缩各段
+
+    template 中用 {名称} 作为占位符；sections 为 [(名称, 文本)]，排在前面的段优先被压缩。
+    返回 (提示词, 估计 token 数)。
+    """
+    budget = calibrated_budget(model_name)
+    texts = dict(sections)
+    # 一次性替换所有占位符，避免资料中恰好出现的“{名称}”被再次替换
+    placeholder = re.compile(r"\{(" + "|".join(re.escape(name) for name in texts) + r")\}")
+
+    def render():
+        return placeholder.sub(lambda match: texts[match.group(1)], template)
+
+    prompt = render()
+    estimated = estimate_tokens(prompt)
+    for name, _ in sections:
+        if estimated <= budget:
+            break
+        text = texts[name]
+        section_tokens = estimate_tokens(text)
+        if section_tokens == 0:
+            continue
+        keep = max(0, section_tokens - (estimated - budget))
+        texts[name] = truncate_middle(text, len(text) * keep // section_tokens)
+        prompt = render()
+        estimated = estimate_tokens(prompt)
+        logging.info(f"提示词超出 {model_name} 预算 {budget}，已压缩“{name}”部分")
+    return prompt, estimated
+
+
+class UsageTracker:
+    """记录每次调用的估计 token 数与实际用量"""
+
+    def __init__(self, size=500):
+        self.mutex = QMutex()
+        self.records = deque(maxlen=size)
+
+    def record(self, model_name, kind, estimated, usage):
+        """usage 为接口返回的 usage 对象，可能为空"""
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        self.mutex.lock()
+        try:
+            self.records.append({
+                "model": model_name,
+                "kind": kind,
+                "estimated": estimated,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+            })
+        finally:
+            self.mutex.unlock()
+        logging.info(
+            f"{kind} 调用 {model_name}：估计提示词 {estimated} tokens，"
+            f"实际提示词 {prompt_tokens}，输出 {completion_tokens}"
+        )
+
+    def estimate_ratio(self, model_name, min_samples=5):
+        """实际与估计 token 数之比的平均值，用于校准估算；样本少于 min_samples 时返回 None"""
+        self.mutex.lock()
+        try:
+            ratios = [
+                r["prompt_tokens"] / r["estimated"]
+                for r in self.records
+                if r["model"] == model_name and r["prompt_tokens"] and r["estimated"]
+            ]
+        finally:
+            self.mutex.unlock()
+        return sum(ratios) / len(ratios) if len(ratios) >= min_samples else None
+
+
+usage_tracker = UsageTracker()
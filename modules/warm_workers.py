@@ -0,0 +1,489 @@
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import signal
+import logging
+import threading
+import subprocess
+from PyQt5.QtCore import QMutex
+
+# modules/warm_workers.py
+#
+# 常驻的 Python/Node 工作进程。应用与工作进程之间每行一个 JSON 请求/响应：
+# 请求 {"code", "input", "time_limit", "memory_limit", "stream"}，
+# 响应 {"exit_code", "stdout", "stderr", "time_ms", "memory_kb", "timed_out"}。
+# memory_kb 为本次运行进程的峰值内存，包含解释器本身占用的部分。
+# 请求中 stream 为真时，响应之前先逐段发出 {"stream": "stdout"/"stderr", "text"}；
+# 工作进程收到 SIGUSR1 时杀掉正在进行的运行，随后照常发出响应。
+
+MAX_OUTPUT_CHARS = 200000
+
+# 两种工作进程共用的部分：每次运行都在新的子进程和临时目录中进行，运行结束即退出，
+# 运行之间不共享任何状态。子进程按请求设置 CPU、内存和文件大小限制，自成一个进程组，
+# 超时或结束后整组杀掉，用户代码再创建的子进程不会残留；
+# 工作进程收到 SIGTERM 时同样先杀掉正在进行的运行和备用进程。
+WORKER_COMMON = r'''
+import os, sys, json, time, codecs, signal, shutil, tempfile, resource
+
+MAX_OUTPUT_CHARS = %d
+
+# 正在进行的运行和备用进程：进程组号 -> 临时目录
+running = {}
+standby = {}
+
+def kill_group(pgid):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except OSError:
+        pass
+
+def terminate(signum, frame):
+    for pgid, workspace in [*running.items(), *standby.items()]:
+        kill_group(pgid)
+        shutil.rmtree(workspace, ignore_errors=True)
+    os._exit(0)
+
+def cancel(signum, frame):
+    for pgid in running:
+        kill_group(pgid)
+
+signal.signal(signal.SIGTERM, terminate)
+signal.signal(signal.SIGUSR1, cancel)
+
+def set_limits(time_limit, memory_limit, memory_resource=resource.RLIMIT_AS, cpu_extra=1):
+    cpu_seconds = int(time_limit) + cpu_extra
+    memory_bytes = memory_limit * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    resource.setrlimit(memory_resource, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (10 * 1024 * 1024, 10 * 1024 * 1024))
+
+def redirect():
+    for fd, name, flags in (
+        (0, "input.txt", os.O_RDONLY),
+        (1, "output.txt", os.O_WRONLY | os.O_CREAT),
+        (2, "error.txt", os.O_WRONLY | os.O_CREAT),
+    ):
+        f = os.open(name, flags, 0o600)
+        os.dup2(f, fd)
+        os.close(f)
+
+def make_workspace():
+    workspace = tempfile.mkdtemp(prefix="exam_warm_")
+    for name in ("input.txt", "output.txt", "error.txt"):
+        write(workspace, name, "")
+    return workspace
+
+def write(workspace, name, text):
+    with open(os.path.join(workspace, name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+def read(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read(MAX_OUTPUT_CHARS)
+
+def open_streams(workspace):
+    return [
+        (name, open(os.path.join(workspace, file_name), "rb"), codecs.getincrementaldecoder("utf-8")("replace"))
+        for name, file_name in (("stdout", "output.txt"), ("stderr", "error.txt"))
+    ]
+
+def forward(streams, final=False):
+    """把输出文件中新写入的内容发给应用，final 时读完剩余内容"""
+    for name, f, decoder in streams:
+        text = decoder.decode(f.read() if final else f.read(65536), final)
+        if text:
+            sys.stdout.write(json.dumps({"stream": name, "text": text}) + "\n")
+            sys.stdout.flush()
+
+def serve(start):
+    """逐行处理请求，start(request) 启动一次运行并返回 (进程号, 临时目录, 开始时间)"""
+    for line in sys.stdin:
+        request = json.loads(line)
+        pid, workspace, started = start(request)
+        # 父子进程都设置一次，避免超时时子进程还没来得及建立进程组
+        try:
+            os.setpgid(pid, pid)
+        except OSError:
+            pass
+        running[pid] = workspace
+        streams = open_streams(workspace) if request.get("stream") else []
+        deadline = started + request["time_limit"]
+        timed_out = False
+        delay = 0.0005
+        while True:
+            done, status, usage = os.wait4(pid, os.WNOHANG)
+            if done:
+                break
+            forward(streams)
+            if not timed_out and time.monotonic() > deadline:
+                kill_group(pid)
+                timed_out = True
+            time.sleep(delay)
+            delay = min(delay * 2, 0.01)
+        kill_group(pid)
+        forward(streams, final=True)
+        for name, f, decoder in streams:
+            f.close()
+        exit_code = os.waitstatus_to_exitcode(status)
+        response = {
+            "exit_code": exit_code,
+            "stdout": read(os.path.join(workspace, "output.txt")),
+            "stderr": read(os.path.join(workspace, "error.txt")),
+            "time_ms": round((time.monotonic() - started) * 1000, 1),
+            "memory_kb": usage.ru_maxrss,
+            "timed_out": timed_out or exit_code == -24,
+        }
+        shutil.rmtree(workspace, ignore_errors=True)
+        del running[pid]
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+''' % MAX_OUTPUT_CHARS
+
+# Python 工作进程：预先导入常用模块后，每次运行 fork 出一个子进程执行代码。
+# 子进程继承已经初始化好的解释器，省去启动解释器和导入模块的时间。
+PYTHON_WORKER = WORKER_COMMON + r'''
+import traceback
+import math, re, string, random, collections, itertools, functools, heapq, bisect
+
+def child(request, workspace):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    os.setpgid(0, 0)
+    os.chdir(workspace)
+    set_limits(request["time_limit"], request["memory_limit"])
+    redirect()
+    # 流式输出时按行刷新，输出能及时显示
+    buffering = 1 if request.get("stream") else -1
+    sys.stdin = open(0, "r", encoding="utf-8", closefd=False)
+    sys.stdout = open(1, "w", buffering, encoding="utf-8", closefd=False)
+    sys.stderr = open(2, "w", buffering, encoding="utf-8", closefd=False)
+    exit_code = 0
+    try:
+        exec(compile(request["code"], "main.py", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            exit_code = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(exit_code)
+
+def start(request):
+    workspace = make_workspace()
+    write(workspace, "input.txt", request.get("input", ""))
+    # 写出源文件，使异常回溯能显示出错的代码行
+    write(workspace, "main.py", request["code"])
+    sys.stdout.flush()
+    started = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        child(request, workspace)
+    return pid, workspace, started
+
+serve(start)
+'''
+
+# Node 的备用进程：启动完成后阻塞等待启动信号，收到后作为主模块运行 main.js。
+# 监督进程退出时管道关闭，读到空内容直接退出。
+NODE_RUNNER = r'''
+const fs = require("fs");
+const path = require("path");
+const Module = require("module");
+const signalFd = Number(process.argv[1]);
+const go = fs.readFileSync(signalFd);
+fs.closeSync(signalFd);
+if (go.length === 0) {
+  process.exit(0);
+}
+const main = path.resolve("main.js");
+process.argv.splice(1, Infinity, main);
+Module.runMain(main);
+'''
+
+# Node 工作进程：Node 无法 fork，由 Python 监督进程预先启动一个备用 Node 进程，
+# 在临时目录中准备好标准输入输出并设置资源限制。收到请求后写入代码和输入并发出启动信号，
+# 随即启动下一个备用进程，每次运行都是全新的 Node 进程，只省去启动运行时的时间。
+# V8 启动时要预留数 GB 地址空间，内存限制改用 RLIMIT_DATA；启动耗费的 CPU 时间多留 1 秒。
+NODE_WORKER = WORKER_COMMON + r'''
+NODE_COMMAND = %r
+NODE_RUNNER = %r
+DEFAULT_LIMITS = %r
+
+def spawn(limits):
+    """启动一个备用 Node 进程"""
+    workspace = make_workspace()
+    signal_read, signal_write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+            os.setpgid(0, 0)
+            os.chdir(workspace)
+            set_limits(*limits, resource.RLIMIT_DATA, 2)
+            redirect()
+            os.set_inheritable(signal_read, True)
+            os.execvp(NODE_COMMAND[0], NODE_COMMAND + ["-e", NODE_RUNNER, str(signal_read)])
+        finally:
+            os._exit(127)
+    os.close(signal_read)
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+    standby[pid] = workspace
+    return {"pid": pid, "workspace": workspace, "signal": signal_write, "limits": limits}
+
+def discard(process):
+    del standby[process["pid"]]
+    kill_group(process["pid"])
+    os.close(process["signal"])
+    try:
+        os.waitpid(process["pid"], 0)
+    except ChildProcessError:
+        pass
+    shutil.rmtree(process["workspace"], ignore_errors=True)
+
+def start(request):
+    global spare
+    limits = (request["time_limit"], request["memory_limit"])
+    # 限制不同或备用进程已经退出时重新启动
+    if spare is not None and (spare["limits"] != limits or os.waitpid(spare["pid"], os.WNOHANG)[0]):
+        discard(spare)
+        spare = None
+    if spare is None:
+        spare = spawn(limits)
+    process, spare = spare, None
+    write(process["workspace"], "input.txt", request.get("input", ""))
+    write(process["workspace"], "main.js", request["code"])
+    started = time.monotonic()
+    os.write(process["signal"], b"1")
+    os.close(process["signal"])
+    del standby[process["pid"]]
+    spare = spawn(limits)
+    return process["pid"], process["workspace"], started
+
+spare = spawn(DEFAULT_LIMITS)
+serve(start)
+'''
+
+
+def worker_command(language, memory_limit):
+    """返回启动工作进程的命令，当前平台不支持时返回 None"""
+    if language == "Python":
+        # 依赖 fork 和 resource，只在类 Unix 系统上可用
+        if os.name != "posix":
+            return None
+        return [sys.executable, "-u", "-c", PYTHON_WORKER]
+    if language == "JavaScript":
+        if os.name != "posix" or shutil.which("node") is None:
+            return None
+        node = ["node", f"--max-old-space-size={memory_limit}"]
+        return [sys.executable, "-u", "-c", NODE_WORKER % (node, NODE_RUNNER, (2.0, memory_limit))]
+    return None
+
+
+class WorkerCrashed(Exception):
+    """工作进程退出或无响应"""
+
+
+class WarmWorker:
+    """一个常驻工作进程，由读取线程把响应行放入队列，便于带超时等待
+
+    工作进程在独立的会话中启动，结束时整个进程组一起杀掉，用户代码创建的子进程不会残留。
+    启动和结束由 lock 保护，close 之后不再重启。
+    """
+
+    def __init__(self, command):
+        self.command = command
+        self.process = None
+        self.runs = 0
+        self.closed = False
+        self.lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        with self.lock:
+            if self.closed:
+                raise WorkerCrashed("工作进程池已关闭")
+            self.process = subprocess.Popen(
+                self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                text=True, encoding="utf-8", bufsize=1, start_new_session=os.name == "posix",
+            )
+            self.responses = queue.Queue()
+            self.runs = 0
+            threading.Thread(
+                target=self.read_responses, args=(self.process, self.responses), daemon=True
+            ).start()
+
+    @staticmethod
+    def read_responses(process, responses):
+        for line in process.stdout:
+            responses.put(line)
+        responses.put(None)
+
+    def run(self, code, case_input, time_limit, memory_limit, grace=2.0, on_output=None):
+        """发送一次运行请求并等待响应
+
+        提供 on_output 时请求流式输出，运行期间每有新输出就以 (流名称, 文本) 回调。
+        """
+        self.runs += 1
+        request = {"code": code, "input": case_input, "time_limit": time_limit, "memory_limit": memory_limit}
+        if on_output is not None:
+            request["stream"] = True
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+        except OSError as e:
+            raise WorkerCrashed(f"无法写入工作进程: {e}")
+        deadline = time.monotonic() + time_limit + grace
+        while True:
+            try:
+                line = self.responses.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise WorkerCrashed("工作进程无响应")
+            if line is None:
+                raise WorkerCrashed("工作进程意外退出")
+            message = json.loads(line)
+            if "stream" not in message:
+                return message
+            on_output(message["stream"], message["text"])
+
+    def cancel(self):
+        """请工作进程杀掉正在进行的运行，工作进程本身继续等待下一个请求"""
+        with self.lock:
+            if self.process is not None and self.process.poll() is None:
+                os.kill(self.process.pid, signal.SIGUSR1)
+
+    def restart(self):
+        self.kill()
+        self.start()
+
+    def kill(self, grace=0.5):
+        """先请工作进程结束正在进行的运行，grace 秒后杀掉整个进程组"""
+        with self.lock:
+            process = self.process
+            if process is None or process.poll() is not None:
+                return
+            process.terminate()
+            try:
+                process.wait(grace)
+            except subprocess.TimeoutExpired:
+                pass
+            if os.name == "posix":
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            else:
+                process.kill()
+            process.wait()
+
+    def close(self):
+        self.closed = True
+        self.kill()
+
+
+class WarmWorkerPool:
+    """某种语言的常驻工作进程池
+
+    工作进程在创建时启动，完成解释器初始化后等待请求，单次运行无需再启动解释器。
+    工作进程崩溃、无响应或运行次数达到 max_runs 时会被重启。
+    """
+
+    def __init__(self, language, size=2, max_runs=500, memory_limit=256):
+        self.language = language
+        self.size = size
+        self.max_runs = max_runs
+        self.memory_limit = memory_limit
+        self.command = worker_command(language, memory_limit)
+        self.idle = queue.Queue()
+        self.workers = [WarmWorker(self.command) for _ in range(size)]
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def acquire(self):
+        return self.idle.get()
+
+    def release(self, worker):
+        if worker.runs >= self.max_runs:
+            worker.restart()
+        self.idle.put(worker)
+
+    def execute(self, worker, code, case_input="", time_limit=2.0, on_output=None):
+        """在指定工作进程中运行代码，工作进程崩溃时重启并返回 crashed 为真的错误结果"""
+        started = time.monotonic()
+        try:
+            return worker.run(code, case_input, time_limit, self.memory_limit, on_output=on_output)
+        except (WorkerCrashed, ValueError) as e:
+            logging.warning(f"{self.language} 工作进程已重启: {e}")
+            worker.restart()
+            return {
+                "exit_code": -1,
+                "stdout": "",
+                "stderr": str(e),
+                "time_ms": round((time.monotonic() - started) * 1000, 1),
+                "memory_kb": None,
+                "timed_out": isinstance(e, WorkerCrashed) and "无响应" in str(e),
+                "crashed": True,
+            }
+
+    def run(self, code, case_input="", time_limit=2.0):
+        """取一个空闲工作进程运行代码，返回响应字典"""
+        worker = self.acquire()
+        try:
+            return self.execute(worker, code, case_input, time_limit)
+        finally:
+            self.release(worker)
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+
+class WarmWorkerManager:
+    """按语言懒加载工作进程池；当前平台不支持或解释器不存在时返回 None"""
+
+    def __init__(self, pool_size=None):
+        self.pool_size = pool_size or min(4, os.cpu_count() or 1)
+        self.mutex = QMutex()
+        self.pools = {}
+
+    def get_pool(self, language):
+        self.mutex.lock()
+        try:
+            if language not in self.pools:
+                self.pools[language] = None
+                if worker_command(language, 256) is not None:
+                    try:
+                        self.pools[language] = WarmWorkerPool(language, self.pool_size)
+                        logging.info(f"已启动 {self.pool_size} 个 {language} 常驻工作进程")
+                    except OSError as e:
+                        logging.error(f"无法启动 {language} 工作进程: {e}")
+            return self.pools[language]
+        finally:
+            self.mutex.unlock()
+
+    def shutdown(self):
+        self.mutex.lock()
+        try:
+            for pool in self.pools.values():
+                if pool is not None:
+                    pool.close()
+            self.pools.clear()
+        finally:
+            self.mutex.unlock()
+
+
+warm_workers = WarmWorkerManager()
+